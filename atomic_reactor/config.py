@@ -180,6 +180,7 @@ class ReactorConfigKeys(object):
     OPERATOR_MANIFESTS_KEY = 'operator_manifests'
     IMAGE_SIZE_LIMIT_KEY = 'image_size_limit'
     BUILDER_CA_BUNDLE_KEY = 'builder_ca_bundle'
+    PARALLEL_PLATFORM_ACTIONS_KEY = 'parallel_platform_actions'
 
 
 class ODCSConfig(object):
@@ -520,3 +521,7 @@ class Configuration(object):
     @property
     def builder_ca_bundle(self):
         return self._get_value(ReactorConfigKeys.BUILDER_CA_BUNDLE_KEY, fallback=None)
+
+    @property
+    def parallel_platform_actions(self):
+        return self._get_value(ReactorConfigKeys.PARALLEL_PLATFORM_ACTIONS_KEY, fallback=False)
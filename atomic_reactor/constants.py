@@ -71,6 +71,7 @@ TOOLS_USED = (
 )
 
 DEFAULT_DOWNLOAD_BLOCK_SIZE = 10 * 1024 * 1024  # 10Mb
+IMAGE_LAYER_READ_BUFFER_SIZE = 4 * 1024 * 1024  # 4Mb
 
 IMAGE_TYPE_DOCKER_ARCHIVE = 'docker-archive'
 IMAGE_TYPE_OCI = 'oci'
@@ -8,6 +8,8 @@ of the BSD license. See the LICENSE file for details.
 import logging
 import reflink
 
+from concurrent.futures import ThreadPoolExecutor
+
 from pathlib import Path
 import shutil
 from shutil import copytree
@@ -246,6 +248,35 @@ class RootBuildDir(object):
             results[platform] = action(self.platform_dir(platform))
         return results
 
+    def for_each_platform_parallel(self, action: Callable[[BuildDir], T]) -> Dict[str, T]:
+        """Apply an action on every platform-specific directory concurrently.
+
+        This works like ``for_each_platform``, but the action is applied to all
+        the platform-specific directories at the same time, each one in its own
+        thread. It is meant for actions which spend most of the time waiting
+        for subprocesses or I/O. The action must not share mutable state
+        between platforms.
+
+        If the action raises an error for any platform, the error is propagated
+        to the caller once the actions for all the platforms have finished.
+
+        :param action: a callable object that will be applied on every
+            platform-specific directory. This callable must accept one single
+            argument in BuildDir type, and it can return data in any type.
+        :type action: Callable
+        :return: a mapping from platform to the value returned from the
+            function which is called for that platform.
+        :rtype: dict[str, any]
+        """
+        if not self.has_sources:
+            raise BuildDirIsNotInitialized()
+        with ThreadPoolExecutor(max_workers=len(self.platforms)) as executor:
+            futures = {
+                platform: executor.submit(action, self.platform_dir(platform))
+                for platform in self.platforms
+            }
+        return {platform: future.result() for platform, future in futures.items()}
+
     def for_all_platforms_copy(self, action: FileCreationFunc) -> List[Path]:
         """Ensure created files are present in all platform-specific directories.
 
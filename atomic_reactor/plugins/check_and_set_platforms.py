@@ -10,6 +10,7 @@ Query the koji build target, if any, to find the enabled architectures. Remove a
 architectures, and return the resulting list.
 """
 import json
+import logging
 from typing import List, Optional
 from atomic_reactor.plugin import Plugin
 from atomic_reactor.util import is_scratch_build, is_isolated_build, map_to_user_params
@@ -40,19 +41,20 @@ class CheckAndSetPlatformsPlugin(Plugin):
 
         :param platforms: a list of platforms to be filtered.
         :type platforms: list[str]
-        :return: the limited platforms.
+        :return: the limited platforms, in the order they were given.
         :rtype: list[str]
         """
-        final_platforms = set(platforms)
         source_config = self.workflow.source.config
-        only_platforms = set(source_config.only_platforms)
-        excluded_platforms = set(source_config.excluded_platforms)
+        only_platforms = frozenset(source_config.only_platforms)
+        excluded_platforms = frozenset(source_config.excluded_platforms)
 
-        if only_platforms:
-            if only_platforms == excluded_platforms:
-                self.log.warning('only and not platforms are the same: %r', only_platforms)
-            final_platforms &= only_platforms
-        return list(final_platforms - excluded_platforms)
+        if only_platforms and only_platforms == excluded_platforms:
+            self.log.warning('only and not platforms are the same: %r', only_platforms)
+        return [
+            platform for platform in dict.fromkeys(platforms)
+            if (not only_platforms or platform in only_platforms)
+            and platform not in excluded_platforms
+        ]
 
     def run(self) -> Optional[List[str]]:
         """
@@ -64,15 +66,24 @@ class CheckAndSetPlatformsPlugin(Plugin):
         if self.koji_target:
             koji_session = get_koji_session(self.workflow.conf)
             self.log.info("Checking koji target for platforms")
-            event_id = koji_session.getLastEvent()['id']
-            target_info = koji_session.getBuildTarget(self.koji_target, event=event_id)
+            # getLastEvent() and getBuildTarget() are batched to save a round-trip,
+            # but then the target cannot be pinned to the event. The calls are not
+            # one snapshot: a target edited between them is seen here, while
+            # getBuildConfig() below still reads the older event. This small race
+            # is the cost of the saved round-trip.
+            with koji_session.multicall(strict=True) as m:
+                last_event = m.getLastEvent()
+                target = m.getBuildTarget(self.koji_target)
+            event_id = last_event.result['id']
+            target_info = target.result
             build_tag = target_info['build_tag']
             koji_build_conf = koji_session.getBuildConfig(build_tag, event=event_id)
             koji_platforms = koji_build_conf['arches']
             if not koji_platforms:
                 raise RuntimeError("No platforms found in koji target")
             platforms = koji_platforms.split()
-            self.log.info("Koji platforms are %s", sorted(platforms))
+            if self.log.isEnabledFor(logging.INFO):
+                self.log.info("Koji platforms are %s", sorted(platforms))
 
             if is_scratch_build(self.workflow) or is_isolated_build(self.workflow):
                 override_platforms = set(user_platforms or [])
@@ -83,26 +94,28 @@ class CheckAndSetPlatformsPlugin(Plugin):
                     self.log.info("Using them instead of koji platforms")
         else:
             platforms = user_platforms
-            self.log.info(
-                "No koji platforms. User specified platforms are %s",
-                sorted(platforms) if platforms else None,
-            )
+            if self.log.isEnabledFor(logging.INFO):
+                self.log.info(
+                    "No koji platforms. User specified platforms are %s",
+                    sorted(platforms) if platforms else None,
+                )
 
         if not platforms:
             raise RuntimeError("Cannot determine platforms; no koji target or platform list")
 
         # Filter platforms based on configured remote hosts
         remote_host_pools = self.workflow.conf.remote_hosts.get("pools", {})
+        platforms_with_enabled_hosts = {
+            platform for platform, platform_hosts in remote_host_pools.items()
+            # enabled defaults to true in the config schema
+            if any(host_info.get("enabled", True) for host_info in platform_hosts.values())
+        }
         enabled_platforms = []
         defined_but_disabled = []
         undefined_platforms = []
 
-        def has_enabled_hosts(platform: str) -> bool:
-            platform_hosts = remote_host_pools.get(platform, {})
-            return any(host_info["enabled"] for host_info in platform_hosts.values())
-
         for p in platforms:
-            if has_enabled_hosts(p):
+            if p in platforms_with_enabled_hosts:
                 enabled_platforms.append(p)
             elif p in remote_host_pools:
                 defined_but_disabled.append(p)
@@ -116,12 +129,13 @@ class CheckAndSetPlatformsPlugin(Plugin):
             raise RuntimeError(msg)
 
         if user_platforms_override:
-            final_platforms = platforms
+            # user specified platforms are not limited by the platforms config,
+            # only the ones without remote hosts are skipped
+            final_defined = enabled_platforms
         else:
-            final_platforms = self._limit_platforms(enabled_platforms)
-            self.log.info("platforms in limits : %s", final_platforms)
+            final_defined = self._limit_platforms(enabled_platforms)
+            self.log.info("platforms in limits : %s", final_defined)
 
-        final_defined = list(set(final_platforms) - set(undefined_platforms))
         if not final_defined:
             self.log.error("final platforms are empty")
             raise RuntimeError("No platforms to build for")
@@ -130,6 +144,6 @@ class CheckAndSetPlatformsPlugin(Plugin):
 
         if self.workflow.platforms_result:
             with open(self.workflow.platforms_result, 'w') as f:
-                f.write(json.dumps(final_defined))
+                json.dump(final_defined, f, separators=(',', ':'))
 
         return final_defined
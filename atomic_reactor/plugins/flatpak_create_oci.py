@@ -11,9 +11,7 @@ and turns it into a Flatpak application or runtime.
 """
 import functools
 import os.path
-import shutil
 import subprocess
-import tempfile
 from typing import Any, Dict, Optional
 
 from atomic_reactor.utils import retries
@@ -24,6 +22,7 @@ from atomic_reactor.constants import (IMAGE_TYPE_OCI,
                                       PLUGIN_RESOLVE_COMPOSES_KEY)
 from atomic_reactor.dirs import BuildDir
 from atomic_reactor.plugin import Plugin
+from atomic_reactor.types import ImageInspectionData
 from atomic_reactor.util import get_exported_image_metadata, is_flatpak_build
 from atomic_reactor.utils.flatpak_util import FlatpakUtil
 from atomic_reactor.utils.rpm import parse_rpm_output
@@ -44,59 +43,55 @@ class FlatpakCreateOciPlugin(Plugin):
         except KeyError:
             self.flatpak_metadata = FLATPAK_METADATA_ANNOTATIONS
 
-    def build_flatpak_image(self, source, build_dir: BuildDir) -> Dict[str, Any]:
+    def build_flatpak_image(self, source, base_inspect: ImageInspectionData,
+                            build_dir: BuildDir) -> Dict[str, Any]:
         builder = FlatpakBuilder(source, build_dir.path,
                                  'var/tmp/flatpak-build',
                                  parse_manifest=parse_rpm_output,
                                  flatpak_metadata=self.flatpak_metadata)
 
-        df_labels = build_dir.dockerfile_with_parent_env(
-            self.workflow.imageutil.base_image_inspect()
-        ).labels
+        df_labels = build_dir.dockerfile_with_parent_env(base_inspect).labels
 
         builder.add_labels(df_labels)
 
-        tmp_dir = tempfile.mkdtemp(dir=build_dir.path)
-
-        image_filesystem = self.workflow.imageutil.extract_filesystem_layer(
-            str(build_dir.exported_squashed_image), str(tmp_dir))
-
-        build_dir.exported_squashed_image.unlink()
-
-        filesystem_path = os.path.join(tmp_dir, image_filesystem)
-
-        with open(filesystem_path, 'rb') as f:
+        with self.workflow.imageutil.open_filesystem_layer(
+                str(build_dir.exported_squashed_image)) as f:
             # this part is 'not ideal' but this function seems to be a prerequisite
             # for building flatpak image since it does the setup for it
             flatpak_filesystem, flatpak_manifest = builder._export_from_stream(f)
 
-        os.remove(filesystem_path)
+        build_dir.exported_squashed_image.unlink()
 
         self.log.info('filesystem tarfile written to %s', flatpak_filesystem)
 
         image_rpm_components = builder.get_components(flatpak_manifest)
 
-        ref_name, outfile, outfile_tarred = builder.build_container(flatpak_filesystem)
+        try:
+            ref_name, outfile, outfile_tarred = builder.build_container(flatpak_filesystem)
+        finally:
+            # the filesystem tarball is as large as the image, don't keep it around
+            os.remove(flatpak_filesystem)
 
         os.remove(outfile_tarred)
 
         metadata = get_exported_image_metadata(outfile, IMAGE_TYPE_OCI)
         metadata['ref_name'] = ref_name
 
+        # Keep the layers in the docker archive uncompressed, the sizes of the
+        # tar members are reported as uncompressed layer sizes later on
         cmd = ['skopeo', 'copy', 'oci:{path}:{ref_name}'.format(**metadata), '--format=v2s2',
                'docker-archive:{}'.format(str(build_dir.exported_squashed_image))]
-        cleanup_cmd = ['rm', str(build_dir.exported_squashed_image)]
+        remove_partial_image = functools.partial(build_dir.exported_squashed_image.unlink,
+                                                 missing_ok=True)
 
         try:
-            retries.run_cmd(cmd, cleanup_cmd)
+            retries.run_cmd(cmd, cleanup_func=remove_partial_image)
         except subprocess.CalledProcessError as e:
             self.log.error("skopeo copy failed with output:\n%s", e.output)
             raise RuntimeError("skopeo copy failed with output:\n{}".format(e.output)) from e
 
         self.log.info('OCI image is available as %s', outfile)
 
-        shutil.rmtree(tmp_dir)
-
         self.workflow.data.image_components[build_dir.platform] = image_rpm_components
 
         return metadata
@@ -115,6 +110,12 @@ class FlatpakCreateOciPlugin(Plugin):
         if not source:
             raise RuntimeError("flatpak_create_dockerfile must be run before flatpak_create_oci")
 
-        build_flatpak_image = functools.partial(self.build_flatpak_image, source)
+        # the base image is the same for all platforms, inspect it only once
+        base_inspect = self.workflow.imageutil.base_image_inspect()
+        build_flatpak_image = functools.partial(self.build_flatpak_image, source, base_inspect)
 
-        return self.workflow.build_dir.for_each_platform(build_flatpak_image)
+        if self.workflow.conf.parallel_platform_actions:
+            for_each_platform = self.workflow.build_dir.for_each_platform_parallel
+        else:
+            for_each_platform = self.workflow.build_dir.for_each_platform
+        return for_each_platform(build_flatpak_image)
@@ -77,8 +77,9 @@ class GatherBuildsMetadataPlugin(Plugin):
     def _get_build_rpms(self, platform: str, build_host: str):
         remote_host = None
 
-        remote_host_pools = self.workflow.conf.remote_hosts.get("pools", {})
-        slots_dir = self.workflow.conf.remote_hosts.get("slots_dir")
+        remote_hosts = self.workflow.conf.remote_hosts
+        remote_host_pools = remote_hosts.get("pools", {})
+        slots_dir = remote_hosts.get("slots_dir")
         platform_config = remote_host_pools.get(platform)
 
         if not platform_config:
@@ -95,13 +96,18 @@ class GatherBuildsMetadataPlugin(Plugin):
         if not remote_host:
             raise RuntimeError(f"unable to get remote host instance: {build_host}")
 
-        rpms = remote_host.rpms_installed
-        if not rpms:
+        # Parse the rpms as they are received, lines not matching the query
+        # format (e.g. empty ones) are skipped by the parser
+        try:
+            components = parse_rpm_output(remote_host.iter_rpms_installed())
+        except Exception as e:
+            raise RuntimeError(f"unable to obtain installed rpms on: {build_host}") from e
+        finally:
+            remote_host.close()
+        if not components:
             raise RuntimeError(f"unable to obtain installed rpms on: {build_host}")
 
-        all_rpms = [line for line in rpms.splitlines() if line]
-
-        return parse_rpm_output(all_rpms)
+        return components
 
     def _get_build_metadata(self, platform: str):
         """
@@ -6,16 +6,16 @@ This software may be modified and distributed under the terms
 of the BSD license. See the LICENSE file for details.
 """
 import os
-import subprocess
 import tempfile
 from typing import List
 
 from atomic_reactor.dirs import BuildDir
 from atomic_reactor.plugin import Plugin
 from atomic_reactor.types import RpmComponent
+from atomic_reactor.util import is_flatpak_build
 from atomic_reactor.utils.imageutil import NothingExtractedError
+from atomic_reactor.utils.rpm import get_rpm_list
 from atomic_reactor.utils.rpm import parse_rpm_output
-from atomic_reactor.utils.rpm import rpm_qf_args
 
 RPMDB_PATH = '/var/lib/rpm'
 RPMDB_DIR_NAME = 'rpm'
@@ -43,8 +43,14 @@ class RPMqaPlugin(Plugin):
         if self.workflow.data.image_components:
             self.log.info('Another plugin has already filled in the image component list, skip')
             return None
-        self.workflow.data.image_components = self.workflow.build_dir.for_each_platform(
-            self.gather_output)
+        if is_flatpak_build(self.workflow):
+            self.log.info('Image components of flatpaks are listed by flatpak_create_oci, skip')
+            return None
+        if self.workflow.conf.parallel_platform_actions:
+            for_each_platform = self.workflow.build_dir.for_each_platform_parallel
+        else:
+            for_each_platform = self.workflow.build_dir.for_each_platform
+        self.workflow.data.image_components = for_each_platform(self.gather_output)
 
     def gather_output(self, build_dir: BuildDir) -> List[RpmComponent]:
         image = self.workflow.data.tag_conf.get_unique_images_with_platform(build_dir.platform)[0]
@@ -59,20 +65,19 @@ class RPMqaPlugin(Plugin):
 
             rpmdb_path = os.path.join(rpmdb_dir, RPMDB_DIR_NAME)
 
-            rpm_cmd = 'rpm --dbpath {} {}'.format(rpmdb_path, rpm_qf_args())
+            # gpg-pubkey are autogenerated packages by rpm when you import a gpg key
+            # these are of course not signed, let's ignore those by default
+            ignore_names = ()
+            if self.ignore_autogenerated_gpg_keys:
+                self.log.debug("ignore rpms 'gpg-pubkey'")
+                ignore_names = ('gpg-pubkey',)
+
             try:
-                self.log.info('getting rpms from rpmdb: %s', rpm_cmd)
-                cmd_output = subprocess.check_output(rpm_cmd,
-                                                     shell=True, universal_newlines=True)  # nosec
+                self.log.info('getting rpms from rpmdb: %s', rpmdb_path)
+                output = get_rpm_list(separator=self.sep, dbpath=rpmdb_path,
+                                      ignore_names=ignore_names)
             except Exception as e:
                 self.log.error("Failed to get rpms from rpmdb: %s", e)
                 raise e
-        output = [line for line in cmd_output.splitlines() if line]
-
-        # gpg-pubkey are autogenerated packages by rpm when you import a gpg key
-        # these are of course not signed, let's ignore those by default
-        if self.ignore_autogenerated_gpg_keys:
-            self.log.debug("ignore rpms 'gpg-pubkey'")
-            output = [x for x in output if not x.startswith("gpg-pubkey" + self.sep)]
 
         return parse_rpm_output(output)
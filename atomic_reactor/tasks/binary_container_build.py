@@ -137,11 +137,15 @@ class BinaryBuildTask(Task[BinaryBuildTaskParams]):
         logger.info("Acquiring a build slot on a remote host")
         pool = remote_host.RemoteHostsPool.from_config(remote_hosts_config, self._params.platform)
         resource = None
-        for _ in range(REMOTE_HOST_MAX_RETRIES + 1):
-            resource = pool.lock_resource(prid=self._params.pipeline_run_name)
-            if resource:
-                break
-            time.sleep(REMOTE_HOST_RETRY_INTERVAL)
+        try:
+            for _ in range(REMOTE_HOST_MAX_RETRIES + 1):
+                resource = pool.lock_resource(prid=self._params.pipeline_run_name)
+                if resource:
+                    break
+                time.sleep(REMOTE_HOST_RETRY_INTERVAL)
+        finally:
+            # The build takes a while, don't keep idle connections open meanwhile
+            pool.close()
         if not resource:
             raise BuildTaskError(
                 "Failed to acquire a build slot on any remote host! See the logs for more details."
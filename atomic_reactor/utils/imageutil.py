@@ -12,13 +12,15 @@ import logging
 import tarfile
 import json
 
-from typing import Optional, Union, Dict, List, Any
+from contextlib import contextmanager
+from typing import IO, Iterator, Optional, Union, Dict, List, Any
 from pathlib import Path
 
 from osbs.utils import ImageName
 
 from atomic_reactor import config
 from atomic_reactor import util
+from atomic_reactor.constants import IMAGE_LAYER_READ_BUFFER_SIZE
 from atomic_reactor.types import ImageInspectionData
 from atomic_reactor.utils import retries
 
@@ -193,29 +195,43 @@ class ImageUtil:
                 for (diff_id, layer) in zip(diff_ids, layers)
             ]
 
-    def extract_filesystem_layer(self, src_path: str, dst_path: str) -> str:
-        """Extract filesystem layer from image archive tarball and
-        saves it at dst_path. This is meant for flatpaks and will work
-        only when the archive has 1 layer.
+    @staticmethod
+    def _get_filesystem_layer(tar: tarfile.TarFile, src_path: str) -> str:
+        """Get the name of the only layer in an image archive tarball.
 
-        :param src_path: str, path to image archive tarball
-        :param dst_path: str, path where the layer will be copied
-        :return: str, relative path (from dst_path) to filesystem layer
+        :param tar: TarFile, opened image archive tarball
+        :param src_path: str, path to the image archive tarball, used in error messages
+        :return: str, name of the filesystem layer member in the tarball
         """
-        with tarfile.open(src_path) as tar:
-            manifest_file = tar.extractfile('manifest.json')
-            if not manifest_file:
-                raise ValueError(f'manifest.json from {src_path} is not a regular file')
-            manifest = json.load(manifest_file)
-            # manifest.json can contain additional entries for parent images
-            # but we expect only one
-            if len(manifest) > 1:
-                raise ValueError('manifest.json file has multiple entries, expected only one')
-            layers = manifest[0]['Layers']
-            if len(layers) > 1:
-                raise ValueError(f'Tarball at {src_path} has more than 1 layer')
+        manifest_file = tar.extractfile('manifest.json')
+        if not manifest_file:
+            raise ValueError(f'manifest.json from {src_path} is not a regular file')
+        manifest = json.load(manifest_file)
+        # manifest.json can contain additional entries for parent images
+        # but we expect only one
+        if len(manifest) > 1:
+            raise ValueError('manifest.json file has multiple entries, expected only one')
+        layers = manifest[0]['Layers']
+        if len(layers) > 1:
+            raise ValueError(f'Tarball at {src_path} has more than 1 layer')
+        return layers[0]
 
-            layer_file = tar.getmember(layers[0])
-            tar.extract(layer_file, dst_path)
+    @contextmanager
+    def open_filesystem_layer(self, src_path: str) -> Iterator[IO[bytes]]:
+        """Open filesystem layer from image archive tarball for reading,
+        without extracting it to disk first. This is meant for flatpaks
+        and will work only when the archive has 1 layer.
 
-        return layers[0]
+        :param src_path: str, path to image archive tarball
+        :return: context manager yielding a binary file object with the
+                 content of the filesystem layer
+        """
+        # the layer is usually large, read it in bigger chunks than the default
+        with open(src_path, 'rb', buffering=IMAGE_LAYER_READ_BUFFER_SIZE) as f, \
+                tarfile.open(fileobj=f) as tar:
+            layer = self._get_filesystem_layer(tar, src_path)
+            layer_file = tar.extractfile(layer)
+            if not layer_file:
+                raise ValueError(f'{layer} from {src_path} is not a regular file')
+            with layer_file:
+                yield layer_file
@@ -7,25 +7,43 @@ of the BSD license. See the LICENSE file for details.
 """
 
 import backoff
+import codecs
 import logging
 import os
 import paramiko
 import random
+import select
+import socket
+import threading
 import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from contextlib import contextmanager
-from datetime import datetime
-from functools import cached_property
+from datetime import datetime, timezone
+from functools import cached_property, lru_cache
 from shlex import quote
-from typing import List, Optional, Tuple, Set
+from typing import Dict, Iterator, List, Optional, Tuple, Set, Union
 from paramiko.channel import ChannelFile  # just for type annotation
 from atomic_reactor.utils.rpm import rpm_qf_args
 
 SSH_COMMAND_TIMEOUT = 30
+RECV_BUFFER_SIZE = 65536
 SLOTS_RELATIVE_PATH = "osbs_slots"
+# ASCII record and unit separators, used to tell apart the content of slot
+# files read by a single command, they never appear in valid slot data
+SLOT_RECORD_SEPARATOR = "\x1e"
+SLOT_FIELD_SEPARATOR = "\x1f"
 RETRY_ON_SSH_EXCEPTIONS = (paramiko.ssh_exception.NoValidConnectionsError,
                            paramiko.ssh_exception.SSHException)
 BACKOFF_FACTOR = 3
+# Retries of locking slots use a smaller factor with random jitter, clients
+# competing for the same slots would collide again with deterministic delays
+SLOT_LOCK_BACKOFF_FACTOR = 0.5
+# For how long (in seconds) to wait for the lock of a slot held by others
+SLOT_LOCK_TIMEOUT = 30
 MAX_RETRIES = 3
+# For how long (in seconds) a host checked to be operational is considered so
+OPERATIONAL_CHECK_TTL = 60
 
 logger = logging.getLogger(__name__)
 
@@ -36,6 +54,12 @@ __all__ = [
 ]
 
 
+@lru_cache(maxsize=1)
+def _rpm_query_command() -> str:
+    """ Get the command listing installed rpms, it never changes """
+    return f"rpm {rpm_qf_args()}"
+
+
 class RemoteHostError(RuntimeError):
     pass
 
@@ -57,17 +81,6 @@ class SSHRetrySession(paramiko.SSHClient):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
 
-    @backoff.on_exception(
-        backoff.expo,
-        RETRY_ON_SSH_EXCEPTIONS,
-        factor=BACKOFF_FACTOR,
-        max_tries=MAX_RETRIES,
-        jitter=None,  # use deterministic backoff, do not apply random jitter
-        logger=logger,
-    )
-    def exec_command(self, *args, **kwargs):
-        return super().exec_command(*args, **kwargs)  # nosec ignore B601
-
     @backoff.on_exception(
         backoff.expo,
         RETRY_ON_SSH_EXCEPTIONS,
@@ -79,12 +92,124 @@ class SSHRetrySession(paramiko.SSHClient):
     def connect(self, *args, **kwargs):
         super().connect(*args, **kwargs)
 
+    @staticmethod
+    def _iter_output(channel: paramiko.Channel) -> Iterator[Tuple[bool, bytes]]:
+        """
+        Yield chunks of stdout and stderr of a command as the data arrives
+
+        Reading the streams one after another would stall when the command
+        fills up the window of the other one first.
+
+        :return: iterator of tuples, whether the chunk comes from stderr and the chunk
+        """
+        while True:
+            # Check for EOF before the buffers, the remaining data could arrive
+            # together with EOF right after the buffers were found empty
+            finished = channel.eof_received or channel.closed
+            if channel.recv_ready():
+                yield False, channel.recv(RECV_BUFFER_SIZE)
+            elif channel.recv_stderr_ready():
+                yield True, channel.recv_stderr(RECV_BUFFER_SIZE)
+            elif finished:
+                return
+            elif not select.select([channel], [], [], SSH_COMMAND_TIMEOUT)[0]:
+                raise socket.timeout(f"no output from command in {SSH_COMMAND_TIMEOUT}s")
+
+    def run(self, cmd: str) -> Tuple[str, str, int]:
+        _, stdout, _ = self.exec_command(cmd, timeout=SSH_COMMAND_TIMEOUT)  # nosec ignore B601
+        channel = stdout.channel
+        out, err = bytearray(), bytearray()
+        for is_stderr, chunk in self._iter_output(channel):
+            (err if is_stderr else out).extend(chunk)
+        code = channel.recv_exit_status()
+        return out.decode().strip(), err.decode().strip(), code
+
+    def iter_lines(self, cmd: str) -> Iterator[str]:
+        """
+        Run a command and yield lines of its stdout as they are received,
+        the whole output is never held in memory
+
+        :raises RemoteHostError: if the command exits with non-zero code
+        """
+        _, stdout, _ = self.exec_command(cmd, timeout=SSH_COMMAND_TIMEOUT)  # nosec ignore B601
+        channel = stdout.channel
+        decoder = codecs.getincrementaldecoder("utf-8")()
+        pending = ""
+        err = bytearray()
+        try:
+            for is_stderr, chunk in self._iter_output(channel):
+                if is_stderr:
+                    err.extend(chunk)
+                    continue
+                *lines, pending = (pending + decoder.decode(chunk)).split("\n")
+                yield from lines
+            pending += decoder.decode(b"", final=True)
+            if pending:
+                yield pending
+
+            code = channel.recv_exit_status()
+            if code != 0:
+                raise RemoteHostError(
+                    f"command exited with code {code}: {err.decode().strip()}"
+                )
+        finally:
+            channel.close()
+
+    def open_pipelined_shell(self) -> 'PipelinedShell':
+        """ Open a shell for running several commands over a single channel """
+        return PipelinedShell(self)
+
+
+class PipelinedShell:
+    """
+    Run commands one after another in a single shell on the remote host
+
+    This saves opening a new channel for each command. Output of a command is
+    terminated by a sentinel line on both stdout and stderr, the one on stdout
+    carries the exit code of the command.
+    """
+
+    def __init__(self, session: SSHRetrySession):
+        self._sentinel = f"__END_{uuid.uuid4().hex}__"
+        # A plain non-interactive shell, unlike invoke_shell() it has no pty,
+        # so there is no prompt, echo of input or login banner in the output
+        self._stdin, self._stdout, self._stderr = session.exec_command(  # nosec ignore B601
+            "sh", timeout=SSH_COMMAND_TIMEOUT
+        )
+
+    def _read_until_sentinel(self, stream: ChannelFile) -> Tuple[str, str]:
+        """
+        Read lines from stream until the sentinel line
+
+        :return: the output preceding the sentinel and the rest of the sentinel line
+        """
+        lines = []
+        while True:
+            line = stream.readline()
+            if not line:
+                raise RemoteHostError("shell exited before finishing the command")
+            if line.startswith(self._sentinel):
+                break
+            lines.append(line)
+        # Drop the newline printed before the sentinel
+        return "".join(lines)[:-1].strip(), line[len(self._sentinel):].strip()
+
     def run(self, cmd: str) -> Tuple[str, str, int]:
-        _, stdout, stderr = self.exec_command(cmd, timeout=SSH_COMMAND_TIMEOUT)  # nosec ignore B601
-        out = stdout.read().decode().strip()
-        err = stderr.read().decode().strip()
-        code = stdout.channel.recv_exit_status()
-        return out, err, code
+        # Start the sentinels on a new line, output might not end with one
+        self._stdin.write(
+            f"{{ {cmd}\n}}; rc=$?; "
+            f"printf '\\n{self._sentinel}\\n' >&2; "
+            f"printf '\\n{self._sentinel} %d\\n' $rc\n"
+        )
+        self._stdin.flush()
+
+        out, code = self._read_until_sentinel(self._stdout)
+        err, _ = self._read_until_sentinel(self._stderr)
+        return out, err, int(code)
+
+    def close(self):
+        self._stdin.close()
+        self._stdout.channel.close()
 
 
 class SlotData:
@@ -97,6 +222,17 @@ class SlotData:
         # timestamp: datetime string in iso format
         self.prid = prid
         self.timestamp = timestamp
+        # Parsed timestamp, False if it's not a valid datetime string
+        self._parsed_datetime: Union[datetime, bool, None] = None
+
+    def _parse_timestamp(self) -> Union[datetime, bool]:
+        """ Parse the timestamp only once """
+        if self._parsed_datetime is None:
+            try:
+                self._parsed_datetime = datetime.fromisoformat(self.timestamp)
+            except ValueError:
+                self._parsed_datetime = False
+        return self._parsed_datetime
 
     @classmethod
     def from_string(cls, string: Optional[str]):
@@ -126,11 +262,7 @@ class SlotData:
             return False
 
         # Verify timestamp string is valid datetime string
-        try:
-            datetime.fromisoformat(self.timestamp)
-        except ValueError:
-            return False
-        return True
+        return self._parse_timestamp() is not False
 
     def to_string(self):
         if self.is_empty:
@@ -139,7 +271,11 @@ class SlotData:
 
     @property
     def datetime(self):
-        return datetime.fromisoformat(self.timestamp)
+        parsed = self._parse_timestamp()
+        if parsed is False:
+            # Raise the same error as parsing would
+            return datetime.fromisoformat(self.timestamp)
+        return parsed
 
 
 class RemoteHost:
@@ -169,6 +305,12 @@ class RemoteHost:
         self._slots = slots
         self._socket_path = socket_path
         self._slots_dir = slots_dir
+        # SSH connection shared by the commands run on this host, channels
+        # of the commands are multiplexed over its transport
+        self._ssh_client: Optional[SSHRetrySession] = None
+        self._ssh_client_lock = threading.Lock()
+        # time.monotonic() value until which the host is considered operational
+        self._operational_until = 0.0
 
     @property
     def hostname(self) -> str:
@@ -201,29 +343,35 @@ class RemoteHost:
 
     def _is_valid_slot_id(self, slot_id: int) -> bool:
         """ Check if a slot id is valid """
-        valid_slots = list(range(self.slots))
-        if slot_id not in valid_slots:
+        if not 0 <= slot_id < self.slots:
             logger.error("%s: invalid slot id %s, should be in: %s",
-                         self.hostname, slot_id, valid_slots)
+                         self.hostname, slot_id, list(range(self.slots)))
             return False
         return True
 
+    @cached_property
+    def slot_paths(self) -> Tuple[str, ...]:
+        """ Absolute paths of slot files, indexed by slot ID """
+        return tuple(os.path.join(self.slots_dir, f"slot_{i}") for i in range(self.slots))
+
+    @cached_property
+    def quoted_slot_paths(self) -> Tuple[str, ...]:
+        """ Absolute paths of slot files quoted for shell commands """
+        return tuple(quote(path) for path in self.slot_paths)
+
+    @cached_property
+    def quoted_slot_lock_paths(self) -> Tuple[str, ...]:
+        """ Absolute paths of slots' lock files quoted for shell commands """
+        return tuple(quote(f"{path}.lock") for path in self.slot_paths)
+
     def _get_slot_path(self, slot_id: int) -> str:
         """ Get the absolute path of slot file """
-        return os.path.join(self.slots_dir, f"slot_{slot_id}")
+        return self.slot_paths[slot_id]
 
     def _get_slot_lock_path(self, slot_id: int) -> str:
         """ Get the absolute path of slot's lock file """
-        return os.path.join(self.slots_dir, f"slot_{slot_id}.lock")
+        return f"{self.slot_paths[slot_id]}.lock"
 
-    @backoff.on_exception(
-        backoff.expo,
-        SlotLockError,
-        factor=BACKOFF_FACTOR,
-        max_tries=MAX_RETRIES,
-        jitter=None,  # use deterministic backoff, do not apply random jitter
-        logger=logger,
-    )
     def _get_blocking_session_with_locked_slot(
         self, session: SSHRetrySession, slot_id: int
     ) -> Tuple[ChannelFile, ChannelFile, ChannelFile]:
@@ -234,9 +382,11 @@ class RemoteHost:
         :param slot_id: int, slot ID
         :return: A tuple of stdin, stdout, stderr of the running command
         """
-        # Run `cat` in the session to keep the slot lock file being locked
-        lock_path = quote(self._get_slot_lock_path(slot_id))
-        cmd = f"flock --conflict-exit-code 42 --nonblocking {lock_path} cat"
+        # Run `cat` in the session to keep the slot lock file being locked,
+        # the lock is held by others just for reading and writing the slot,
+        # let flock wait for it rather than retrying
+        lock_path = self.quoted_slot_lock_paths[slot_id]
+        cmd = f"flock --conflict-exit-code 42 --timeout {SLOT_LOCK_TIMEOUT} {lock_path} cat"
 
         _errmsg = f"{self.hostname}: failed to acquire lock on slot {slot_id}"
         try:
@@ -245,9 +395,9 @@ class RemoteHost:
         except Exception as ex:
             raise SlotLockError(_errmsg) from ex
 
-        # A short time sleep to wait for the socket to be ready
-        time.sleep(0.1)
-
+        # No need to wait for the channel before writing, the line echoed back
+        # by `cat` tells the lock is held, while EOF on stdout with exit status
+        # 42 tells the slot is locked by others
         try:
             stdin.write("verify lock\n")
             stdin.flush()
@@ -283,25 +433,31 @@ class RemoteHost:
         try:
             # A session to run any commands, especially for reading and
             # writing the slot file
-            slot_session = self._open_ssh_session()
-            # A special session to keep the lock of the slot
+            slot_session = self._get_ssh_client()
+            # A special session to keep the lock of the slot, it's not shared
+            # to make sure the lock is released once the session is closed
             lock_session = self._open_ssh_session()
         except Exception as ex:
             raise SlotLockError(f"{self.hostname}: failed to open SSH sessions") from ex
 
         _errmsg = f"{self.hostname}: failed to acquire lock on slot {slot_id}"
         lock_stdin = None
+        slot_shell = None
         try:
             lock_stdin, _, _ = self._get_blocking_session_with_locked_slot(
                 lock_session, slot_id
             )
-            yield HostSlot(self, slot_session, slot_id)
+            # The slot is read and written within the lock, run these commands
+            # in a single shell
+            slot_shell = slot_session.open_pipelined_shell()
+            yield HostSlot(self, slot_shell, slot_id)
         except Exception as ex:
             raise SlotLockError(_errmsg) from ex
         finally:
+            if slot_shell:
+                slot_shell.close()
             if lock_stdin:
                 lock_stdin.close()
-            slot_session.close()
             lock_session.close()
 
     def _run(self, cmd: str):
@@ -310,17 +466,48 @@ class RemoteHost:
 
         :return: stdout, stderr and exit code of shell command
         """
-        with self._ssh_session() as session:
-            return session.run(cmd)
+        try:
+            try:
+                with self._ssh_session() as session:
+                    return session.run(cmd)
+            except RETRY_ON_SSH_EXCEPTIONS as ex:
+                # Retrying on a broken connection is pointless, retry once
+                # over a new one
+                logger.debug("%s: command failed, reconnecting: %s", self.hostname, ex)
+                self.close()
+                with self._ssh_session() as session:
+                    return session.run(cmd)
+        except Exception:
+            # Something is wrong with the connection, check the host again next time
+            self._operational_until = 0.0
+            raise
 
     @contextmanager
     def _ssh_session(self):
-        """ Create an SSH connection."""
-        client = self._open_ssh_session()
-        try:
-            yield client
-        finally:
-            client.close()
+        """ Get the SSH connection shared by commands run on this host """
+        yield self._get_ssh_client()
+
+    def _get_ssh_client(self) -> 'SSHRetrySession':
+        """
+        Get the SSH connection shared by commands run on this host,
+        (re)connect if there is no active connection yet.
+        """
+        with self._ssh_client_lock:
+            client = self._ssh_client
+            transport = client.get_transport() if client else None
+            if transport is None or not transport.is_active():
+                if client:
+                    client.close()
+                client = self._ssh_client = self._open_ssh_session()
+            return client
+
+    def close(self):
+        """ Close the SSH connection shared by commands run on this host """
+        with self._ssh_client_lock:
+            if self._ssh_client:
+                logger.debug("%s: closing SSH connection", self.hostname)
+                self._ssh_client.close()
+                self._ssh_client = None
 
     def _open_ssh_session(self):
         """
@@ -334,27 +521,49 @@ class RemoteHost:
 
     @property
     def is_operational(self) -> bool:
-        """ Check whether this host is operational """
+        """
+        Check whether this host is operational, a successful check is cached
+        for OPERATIONAL_CHECK_TTL seconds
+        """
+        if time.monotonic() < self._operational_until:
+            return True
+
         try:
-            _, stderr, code = self._run(f"mkdir -p {quote(self.slots_dir)}")
+            # Create the slot files as well, reading slots then doesn't need to
+            slot_paths = " ".join(self.quoted_slot_paths)
+            _, stderr, code = self._run(
+                f"mkdir -p {quote(self.slots_dir)} && touch {slot_paths}"
+            )
         except Exception as e:
             logger.exception("%s: host is not operational: %s", self.hostname, e)
             return False
         if code != 0:
             logger.error("%s: cannot prepare slots directory:\n%s", self.hostname, stderr)
             return False
+        self._operational_until = time.monotonic() + OPERATIONAL_CHECK_TTL
         return True
 
     @property
     def rpms_installed(self):
         rpms = None
         try:
-            rpms, _, _ = self._run(f"rpm {rpm_qf_args()}")
+            rpms, _, _ = self._run(_rpm_query_command())
         except Exception as e:
             logger.info("can't get rpms from host: %s : %s", self.hostname, e)
 
         return rpms
 
+    def iter_rpms_installed(self) -> Iterator[str]:
+        """
+        Yield rpms installed on this host, one per line, as they are received
+
+        Unlike rpms_installed, the whole output is not held in memory.
+        Errors are raised even after some lines were yielded, so a partial list
+        is never mistaken for the complete one.
+        """
+        with self._ssh_session() as session:
+            yield from session.iter_lines(_rpm_query_command())
+
     def is_free(self, slot_id: int, ssh_session: 'SSHRetrySession') -> bool:
         """ Check whether a slot is in free state
 
@@ -388,9 +597,9 @@ class RemoteHost:
     @backoff.on_exception(
         backoff.expo,
         (SlotLockError, SlotReadError, SlotWriteError),
-        factor=BACKOFF_FACTOR,
+        factor=SLOT_LOCK_BACKOFF_FACTOR,
         max_tries=MAX_RETRIES,
-        jitter=None,  # use deterministic backoff, do not apply random jitter
+        jitter=backoff.full_jitter,  # desynchronize clients competing for slots
         logger=logger,
     )
     def lock(self, slot_id: int, prid: str) -> bool:
@@ -423,9 +632,9 @@ class RemoteHost:
     @backoff.on_exception(
         backoff.expo,
         (SlotLockError, SlotReadError, SlotWriteError),
-        factor=BACKOFF_FACTOR,
+        factor=SLOT_LOCK_BACKOFF_FACTOR,
         max_tries=MAX_RETRIES,
-        jitter=None,  # use deterministic backoff, do not apply random jitter
+        jitter=backoff.full_jitter,  # desynchronize clients competing for slots
         logger=logger,
     )
     def unlock(self, slot_id: int, prid: str) -> bool:
@@ -455,16 +664,51 @@ class RemoteHost:
                            self.hostname, slot_id, prid)
         return unlocked
 
+    def _read_all_slots(self) -> Dict[int, SlotData]:
+        """
+        Read content of all slot files on host with a single command
+
+        :return: slot data of each slot, keyed by slot ID
+        :rtype: dict
+        """
+        _errmsg = f"{self.hostname}: cannot read content of slots"
+        slot_ids = " ".join(str(slot_id) for slot_id in range(self.slots))
+        # Print "<slot_id><field separator><slot content><record separator>" for
+        # each slot, touch the slot file to create it in case it doesn't exist
+        cmd = (
+            f"cd {quote(self.slots_dir)} && for i in {slot_ids}; do "
+            f"touch slot_$i && printf '%s\\037' $i && cat slot_$i && printf '\\036' "
+            f"|| exit 1; done"
+        )
+        try:
+            stdout, stderr, code = self._run(cmd)
+        except Exception as ex:
+            raise SlotReadError(_errmsg) from ex
+
+        if code != 0:
+            _errmsg = f"{_errmsg}: {stderr}" if stderr else _errmsg
+            raise SlotReadError(_errmsg)
+
+        slots_data = {}
+        for record in stdout.split(SLOT_RECORD_SEPARATOR):
+            slot_id, _, content = record.partition(SLOT_FIELD_SEPARATOR)
+            if slot_id.isdigit():
+                slots_data[int(slot_id)] = SlotData.from_string(content.strip())
+
+        if set(slots_data) != set(range(self.slots)):
+            raise SlotReadError(f"{_errmsg}: unexpected output: {stdout!r}")
+        return slots_data
+
     def available_slots(self) -> List[int]:
         """ Get slots on host which are in free state """
         logger.debug("%s: retrieve list of available slots", self.hostname)
         available_slots = []
-        with self._ssh_session() as ssh_session:
-            for slot_id in range(self.slots):
-                if not self.is_free(slot_id, ssh_session):
-                    logger.debug("%s: slot %s is not free", self.hostname, slot_id)
-                    continue
-                available_slots.append(slot_id)
+        for slot_id, data in sorted(self._read_all_slots().items()):
+            # Slots with invalid content are considered to be free
+            if not data.is_empty and data.is_valid:
+                logger.debug("%s: slot %s is not free", self.hostname, slot_id)
+                continue
+            available_slots.append(slot_id)
 
         return available_slots
 
@@ -479,45 +723,52 @@ class RemoteHost:
 
 class HostSlot:
 
-    def __init__(self, host: RemoteHost, session: SSHRetrySession, slot_id: int):
+    def __init__(self, host: RemoteHost, session: Union[SSHRetrySession, PipelinedShell],
+                 slot_id: int):
         """ Instantiate host slot with remote host instance, an ssh session and slot id
 
         :param host: RemoteHost, RemoteHost instance
-        :param session: SSHRetrySession, SSHRetrySession instance
+        :param session: SSHRetrySession or PipelinedShell instance to run commands with
         :param slot_id: int, slot ID
         """
         self.host = host
         self.hostname = host.hostname
         self.session = session
         self.id = slot_id
-        self.path = os.path.join(self.host.slots_dir, f"slot_{slot_id}")
+        self.path = host.slot_paths[slot_id]
+        self._quoted_path = host.quoted_slot_paths[slot_id]
+        self._slot_data: Optional[SlotData] = None
 
-    @property
-    def _data(self) -> SlotData:
-        content = self._read()
-        return SlotData.from_string(content)
+    def _get_data(self, refresh: bool = False) -> SlotData:
+        """ Get data of the slot, the slot file is read only once unless refreshed """
+        if refresh or self._slot_data is None:
+            self._slot_data = SlotData.from_string(self._read())
+        return self._slot_data
 
     @property
     def prid(self) -> Optional[str]:
-        return self._data.prid
+        return self._get_data().prid
 
     @property
     def timestamp(self) -> Optional[str]:
         """ Get timestamp value in slot file """
-        return self._data.timestamp
+        return self._get_data().timestamp
 
     @property
     def datetime(self) -> Optional[datetime]:
         """ Get timestamp value in slot file as a datetime.datetime instance """
-        return self._data.datetime
+        return self._get_data().datetime
 
     def _read(self) -> str:
         """ Read content from slot file """
         _errmsg = f"{self.hostname}: cannot read content of slot {self.id}"
         try:
-            # Touch the slot file to create it in case it doesn't exist
-            slot_path = quote(self.path)
-            stdout, stderr, code = self.session.run(f"touch {slot_path} && cat {slot_path}")
+            # Slot files are created when checking the host is operational
+            slot_path = self._quoted_path
+            stdout, stderr, code = self.session.run(f"cat {slot_path}")
+            if code != 0:
+                # Touch the slot file to create it in case it doesn't exist
+                stdout, stderr, code = self.session.run(f"touch {slot_path} && cat {slot_path}")
         except Exception as ex:
             raise SlotReadError(_errmsg) from ex
 
@@ -528,16 +779,20 @@ class HostSlot:
 
     def _write(self, data: Optional[str] = None):
         """ Write data to slot file """
-        # Empty the file by default
-        cmd = f"truncate -s 0 {quote(self.path)}"
+        # Empty the file by default, use shell builtins only to avoid
+        # spawning a process for such a tiny write
+        cmd = f": > {self._quoted_path}"
         if data:
-            cmd = f"echo {quote(data)} > {quote(self.path)}"
+            cmd = f"printf '%s\\n' {quote(data)} > {self._quoted_path}"
+
+        # The slot file is going to be changed, read it again next time
+        self._slot_data = None
 
         _errmsg = f"{self.hostname}: cannot write data to slot {self.id}"
         try:
             _, stderr, code = self.session.run(cmd)
         except Exception as ex:
-            raise SlotWriteError({_errmsg}) from ex
+            raise SlotWriteError(_errmsg) from ex
 
         if code != 0:
             _errmsg = f"{_errmsg}: {stderr}" if stderr else _errmsg
@@ -546,19 +801,21 @@ class HostSlot:
     @property
     def is_valid(self):
         """ Check whether the content is valid """
-        return self._data.is_valid
+        return self._get_data().is_valid
 
     @property
     def is_free(self) -> bool:
         """ Check whether the slot is in free state """
-        return self._data.is_empty
+        return self._get_data().is_empty
 
     def is_locked_by(self, prid: str) -> bool:
         """ Check whether the slot is locked by a pipelinerun """
-        return self._data.prid == prid
+        return self._get_data().prid == prid
 
     def lock(self, prid: str) -> bool:
         """ Lock the slot for a pipelinerun """
+        # Work with a fresh snapshot of the slot, read only once
+        self._get_data(refresh=True)
         if not self.is_free and self.is_valid:
             logger.debug("%s: slot %s is not free, unable to lock it",
                          self.hostname, self.id)
@@ -568,12 +825,17 @@ class HostSlot:
             logger.warning("%s: slot %s contains invalid content, it's corrupted, "
                            "will use it.", self.hostname, self.id)
 
-        data = SlotData(prid=prid, timestamp=datetime.utcnow().isoformat())
+        # An aware timestamp with "+00:00" offset, fromisoformat() parses it on
+        # all supported Python versions, unlike the "Z" suffix
+        timestamp = datetime.now(timezone.utc).isoformat(timespec="microseconds")
+        data = SlotData(prid=prid, timestamp=timestamp)
         self._write(data.to_string())
         return True
 
     def unlock(self, prid: str) -> bool:
         """ Unlock the slot for a pipelinerun """
+        # Work with a fresh snapshot of the slot, read only once
+        self._get_data(refresh=True)
         if self.is_free:
             logger.warning("%s: slot %s is free, skip unlocking", self.hostname, self.id)
             # Should we return False instead?
@@ -612,7 +874,10 @@ class LockedResource:
 
     def unlock(self):
         """ Unlock the resource for pipelinerun """
-        self.host.unlock(self.slot, self.prid)
+        try:
+            self.host.unlock(self.slot, self.prid)
+        finally:
+            self.host.close()
 
 
 class RemoteHostsPool:
@@ -624,6 +889,11 @@ class RemoteHostsPool:
         self.hosts = hosts
         self.host_platform = host_platform
 
+    def close(self):
+        """ Close SSH connections to all hosts in the pool """
+        for host in self.hosts:
+            host.close()
+
     @classmethod
     def from_config(cls, config: dict, platform: str):
         """ Instantiate remote hosts loaded from a config in dict format
@@ -667,34 +937,87 @@ class RemoteHostsPool:
 
         return cls(hosts, platform)
 
-    def lock_resource(self, prid: str) -> Optional[LockedResource]:
+    @staticmethod
+    def _probe_host(host: RemoteHost) -> Optional[Tuple[RemoteHost, List[int]]]:
         """
-        Lock resource for a pipelinerun
+        Get available slots of a host
+
+        :param host: RemoteHost, host to probe
+        :return: tuple of the host and its available slots in random order,
+            None if the host has no available slots
+        """
+        available_slots = []
+        try:
+            if host.is_operational:
+                available_slots = host.available_slots()
+        except Exception as ex:
+            # Specific exceptions should be handled in nested methods
+            logger.warning("%s: unable to get available slots: %s", host.hostname, ex)
+            return None
 
+        if not available_slots:
+            logger.info("%s: no available slots", host.hostname)
+            return None
+        logger.info("%s: available slots: %s", host.hostname, available_slots)
+        # shuffle the slots to reduce the chance of multiple clients
+        # trying to lock the free slots in the same order
+        return host, random.sample(available_slots, len(available_slots))
+
+    def _lock_host_slot(
+        self, host: RemoteHost, slots: List[int], prid: str
+    ) -> Optional[LockedResource]:
+        """
+        Lock one of the given slots of a host for a pipelinerun
+
+        :param host: RemoteHost, host to lock a slot on
+        :param slots: List[int], slots to try in the given order
         :param prid: str, pipelinerun ID
+        :return: the locked resource, None if no slot could be locked
         """
-        resources = []
-        random.shuffle(self.hosts)
-        for host in self.hosts:
-            available_slots = []
+        for slot in slots:
+            locked = False
             try:
-                if host.is_operational:
-                    available_slots = host.available_slots()
+                locked = host.lock(slot, prid)
             except Exception as ex:
                 # Specific exceptions should be handled in nested methods
-                logger.warning("%s: unable to get available slots: %s", host.hostname, ex)
-                continue
+                logger.warning("%s: unable to lock slot %s for pipelinerun %s: %s",
+                               host.hostname, slot, prid, ex)
+            if locked:
+                return LockedResource(host, self.host_platform, slot, prid)
+        return None
 
-            if not available_slots:
-                logger.info("%s: no available slots", host.hostname)
-                continue
-            logger.info("%s: available slots: %s", host.hostname, available_slots)
-            # random.shuffle the slots to reduce the chance of multiple clients
-            # trying to lock the free slots in the same order
-            random.shuffle(available_slots)
-            resources.append((host, available_slots))
+    def lock_resource(self, prid: str) -> Optional[LockedResource]:
+        """
+        Lock resource for a pipelinerun
 
-        if not resources:
+        :param prid: str, pipelinerun ID
+        """
+        resources = []
+        found_slots = False
+        # Shuffle a copy, the pool might be shared, don't reorder its hosts
+        hosts = random.sample(self.hosts, len(self.hosts))
+        if hosts:
+            # Probing is dominated by SSH round-trips, query all hosts at once.
+            # Leaving the executor waits for the outstanding probes, so none of
+            # them uses a host after the caller closes the pool
+            with ThreadPoolExecutor(max_workers=len(hosts)) as executor:
+                futures = [executor.submit(self._probe_host, host) for host in hosts]
+                for future in as_completed(futures):
+                    resource = future.result()
+                    if not resource:
+                        continue
+                    found_slots = True
+                    host, slots = resource
+                    if len(slots) < host.slots:
+                        resources.append(resource)
+                        continue
+                    # No host can have a higher ratio of available slots than
+                    # a free one, lock it without waiting for the other hosts
+                    locked_resource = self._lock_host_slot(host, slots, prid)
+                    if locked_resource:
+                        return locked_resource
+
+        if not found_slots:
             logger.error("There is no remote host slot available for pipelinerun %s", prid)
             return None
 
@@ -703,16 +1026,9 @@ class RemoteHostsPool:
 
         # Try to lock a remote host slot for pipelinerun
         for host, slots in resources:
-            for slot in slots:
-                locked = False
-                try:
-                    locked = host.lock(slot, prid)
-                except Exception as ex:
-                    # Specific exceptions should be handled in nested methods
-                    logger.warning("%s: unable to lock slot %s for pipelinerun %s: %s",
-                                   host.hostname, slot, prid, ex)
-                if locked:
-                    return LockedResource(host, self.host_platform, slot, prid)
+            locked_resource = self._lock_host_slot(host, slots, prid)
+            if locked_resource:
+                return locked_resource
 
         logger.info("Cannot find remote host resource for pipelinerun %s", prid)
         return None
@@ -8,7 +8,7 @@ of the BSD license. See the LICENSE file for details.
 
 import logging
 import subprocess
-from typing import List
+from typing import Any, Callable, List, Optional
 
 import backoff
 import requests
@@ -89,7 +89,8 @@ def get_retrying_requests_session(client_statuses=HTTP_CLIENT_STATUS_RETRY,
     max_tries=SUBPROCESS_MAX_RETRIES + 1,  # total tries is N retries + 1 initial attempt
     jitter=None,  # use deterministic backoff, do not apply random jitter
 )
-def run_cmd(cmd: List[str], cleanup_cmd: List[str] = None) -> bytes:
+def run_cmd(cmd: List[str], cleanup_cmd: List[str] = None,
+            cleanup_func: Optional[Callable[[], Any]] = None) -> bytes:
     """Run a subprocess command, retry on any non-zero exit status.
 
     Whenever an attempt fails, the stdout and stderr of the failed command will be logged.
@@ -97,6 +98,8 @@ def run_cmd(cmd: List[str], cleanup_cmd: List[str] = None) -> bytes:
     in the `output` attribute.
 
     If a cleanup command is specified it'll be run on exception before retry.
+    If a cleanup function is specified it'll be called on exception before retry,
+    this avoids running a subprocess for simple cleanups such as removing a file.
 
     :return: bytes, the combined stdout and stderr (if any) of the command
     """
@@ -122,6 +125,11 @@ def run_cmd(cmd: List[str], cleanup_cmd: List[str] = None) -> bytes:
                     c_e.stdout.decode(),
                     c_e.stderr.decode(),
                 )
+        if cleanup_func:
+            try:
+                cleanup_func()
+            except OSError as c_e:
+                logger.warning("Cleanup after %s failed: %s", cmd[0], c_e)
         raise
 
     if process.stderr:
@@ -5,12 +5,15 @@ All rights reserved.
 This software may be modified and distributed under the terms
 of the BSD license. See the LICENSE file for details.
 """
+import threading
 from typing import List
 
 from atomic_reactor.types import RpmComponent
 
 import rpm
 
+_rpm_macros_lock = threading.Lock()
+
 image_component_rpm_tags = [
     'NAME',
     'VERSION',
@@ -27,18 +30,34 @@ image_component_rpm_tags = [
 ]
 
 
-def get_rpm_list(tags=None, separator=';'):
+def get_rpm_list(tags=None, separator=';', dbpath=None, ignore_names=()):
     """
     Return a list of RPMs in the format expected by parse_rpm_output.
+
+    :param tags: list, str fields used for query output
+    :param separator: str, separator of the fields
+    :param dbpath: str, path to the rpm database to query, the system one is
+        used if not specified
+    :param ignore_names: collection of str, names of the RPMs to leave out
     """
     if tags is None:
         tags = image_component_rpm_tags
+    fmt = separator.join(["%%{%s}" % tag for tag in tags])
     ts = rpm.TransactionSet()
-    mi = ts.dbMatch()
-    rpms = []
-    for h in mi:
-        rpms.append(separator.join([h.sprintf("%%{%s}" % tag) for tag in tags]))
-    return rpms
+    try:
+        if dbpath is not None:
+            # _dbpath is a process-wide macro, it is only needed while opening the database
+            with _rpm_macros_lock:
+                rpm.addMacro('_dbpath', dbpath)
+                try:
+                    if ts.openDB() != 0:
+                        raise rpm.error('rpmdb open failed: {}'.format(dbpath))
+                finally:
+                    rpm.delMacro('_dbpath')
+        return [h.sprintf(fmt) for h in ts.dbMatch()
+                if not (ignore_names and h['name'] in ignore_names)]
+    finally:
+        ts.closeDB()
 
 
 def rpm_qf_args(tags=None, separator=';'):
@@ -58,7 +77,7 @@ def parse_rpm_output(output, tags=None, separator=';') -> List[RpmComponent]:
     """
     Parse output of the rpm query.
 
-    :param output: list, decoded output (str) from the rpm subprocess
+    :param output: iterable, decoded lines (str) of the rpm query output
     :param tags: list, str fields used for query output
     :return: list, dicts describing each rpm package
     """
@@ -66,14 +85,17 @@ def parse_rpm_output(output, tags=None, separator=';') -> List[RpmComponent]:
     if tags is None:
         tags = image_component_rpm_tags
 
+    # look up field positions once, not for every field of every line
+    tag_indexes = {tag: index for index, tag in enumerate(tags)}
+
     def field(tag):
         """
         Get a field value by name
         """
-        try:
-            value = fields[tags.index(tag)]
-        except ValueError:
+        index = tag_indexes.get(tag)
+        if index is None:
             return None
+        value = fields[index]
 
         if value == '(none)':
             return None
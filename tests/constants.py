@@ -159,4 +159,6 @@ skip_koji_check_for_base_image: False
 deep_manifest_list_inspection: True
 
 fail_on_digest_mismatch: True
+
+parallel_platform_actions: True
 """)
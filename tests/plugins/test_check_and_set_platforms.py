@@ -30,6 +30,26 @@ from tests.mock_env import MockEnv
 KOJI_TARGET = "target"
 
 
+class MockVirtualCall(object):
+    def __init__(self, result):
+        self.result = result
+
+
+class MockMultiCallSession(object):
+    def __init__(self, session):
+        self._session = session
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+    def __getattr__(self, name):
+        method = getattr(self._session, name)
+        return lambda *args, **kwargs: MockVirtualCall(method(*args, **kwargs))
+
+
 # ClientSession is xmlrpc instance, we need to mock it explicitly
 def mock_session(platforms):
     arches = None
@@ -47,12 +67,16 @@ def mock_session(platforms):
         .and_return({'id': last_event_id}))
     (session
         .should_receive('getBuildTarget')
-        .with_args('target', event=last_event_id)
+        .with_args('target')
         .and_return(build_target))
     (session
         .should_receive('getBuildConfig')
         .with_args('build-tag', event=last_event_id)
         .and_return({'arches': arches}))
+    (session
+        .should_receive('multicall')
+        .with_args(strict=True)
+        .replace_with(lambda strict: MockMultiCallSession(session)))
 
     return session
 
@@ -465,3 +489,23 @@ def test_limit_the_platforms(input_platforms, excludes, only, expected, workflow
     assert sorted(expected) == sorted(limited_platforms)
     if only and sorted(only) == sorted(excludes):
         assert "only and not platforms are the same" in caplog.text
+
+
+def test_limit_the_platforms_keeps_order(workflow):
+    write_container_yaml(workflow.source.path, platform_exclude=['s390x'])
+    plugin = CheckAndSetPlatformsPlugin(workflow)
+    limited_platforms = plugin._limit_platforms(['x86_64', 's390x', 'ppc64le', 'x86_64'])
+    assert limited_platforms == ['x86_64', 'ppc64le']
+
+
+def test_remote_host_without_enabled_key(workflow, source_dir):
+    write_container_yaml(source_dir)
+    env = mock_env(workflow, source_dir)
+    env.set_user_params(platforms=['x86_64', 'ppc64le'])
+
+    reactor_config = make_reactor_config_map({'x86_64': True, 'ppc64le': True})
+    del reactor_config['remote_hosts']['pools']['ppc64le']['some-hostname']['enabled']
+    env.set_reactor_config(reactor_config)
+
+    plugin_result = env.create_runner().run()
+    assert sorted(plugin_result[PLUGIN_CHECK_AND_SET_PLATFORMS_KEY]) == ['ppc64le', 'x86_64']
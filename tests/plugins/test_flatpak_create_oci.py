@@ -11,6 +11,7 @@ import os
 import re
 import subprocess
 import tarfile
+from contextlib import contextmanager
 from io import BytesIO
 from pathlib import Path
 from tempfile import NamedTemporaryFile
@@ -449,8 +450,10 @@ def write_docker_file(config, source_path):
                                   version=base_module['version'])))
 
 
-def mock_extract_filesystem(config, src, dest):
-    tmp_dir = Path(dest)
+@contextmanager
+def mock_open_filesystem(config, src):
+    tmp_dir = Path(src).parent / 'mock-filesystem'
+    tmp_dir.mkdir()
     filesystem_dir = tmp_dir / 'filesystem'
     filesystem_dir.mkdir()
 
@@ -479,7 +482,8 @@ def mock_extract_filesystem(config, src, dest):
         for f in os.listdir(filesystem_dir):
             tf.add(os.path.join(filesystem_dir, f), f)
 
-    return 'filesystem.tar'
+    with open(filesystem_tar, 'rb') as f:
+        yield f
 
 
 @pytest.mark.skipif(not MODULEMD_AVAILABLE,  # noqa
@@ -527,10 +531,10 @@ def test_flatpak_create_oci(workflow, config_name, flatpak_metadata, breakage):
     write_docker_file(config, workflow.source.path)
     workflow.build_dir.init_build_dirs(platforms, workflow.source)
 
-    mock_extract_filesystem_call = functools.partial(mock_extract_filesystem, config)
+    mock_open_filesystem_call = functools.partial(mock_open_filesystem, config)
     (flexmock(ImageUtil)
-     .should_receive('extract_filesystem_layer')
-     .replace_with(mock_extract_filesystem_call))
+     .should_receive('open_filesystem_layer')
+     .replace_with(mock_open_filesystem_call))
 
     for image_platform in platforms:
         image_path = workflow.build_dir.platform_dir(image_platform).exported_squashed_image
@@ -558,9 +562,8 @@ def test_flatpak_create_oci(workflow, config_name, flatpak_metadata, breakage):
             skopeo_cmd = ['skopeo', 'copy', f'oci:{str(platform_dir.path)}'
                                             f'/flatpak-oci-image:app/org.gnome.eog/x86_64/stable',
                           '--format=v2s2', f'docker-archive:{platform_dir.exported_squashed_image}']
-            cleanup_cmd = ['rm', str(platform_dir.exported_squashed_image)]
             (flexmock(retries).should_receive('run_cmd')
-                .with_args(skopeo_cmd, cleanup_cmd)
+                .with_args(skopeo_cmd, cleanup_func=functools.partial)
                 .and_raise(subprocess.CalledProcessError(1, ["skopeo", "..."],
                                                          output=b'something went wrong')))
         expected_exception = 'skopeo copy failed with output:'
@@ -593,8 +596,9 @@ def test_flatpak_create_oci(workflow, config_name, flatpak_metadata, breakage):
         assert workflow.data.image_components[platforms[0]] == expected_components
         assert dir_metadata['type'] == IMAGE_TYPE_OCI
         for image_platform in platforms:
-            image_path = workflow.build_dir.platform_dir(image_platform).exported_squashed_image
-            assert image_path.exists()
+            platform_dir = workflow.build_dir.platform_dir(image_platform)
+            assert platform_dir.exported_squashed_image.exists()
+            assert not platform_dir.path.joinpath('filesystem.tar.gz').exists()
 
         # Check that the correct labels and annotations were written
 
@@ -147,7 +147,10 @@ def test_gather_builds_metadata(has_s390x_build_logs, workflow: DockerBuildWorkf
     all_rpms = [line for line in package_list.splitlines() if line]
     all_components = parse_rpm_output(all_rpms)
 
-    flexmock(RemoteHost).should_receive('rpms_installed').and_return(package_list)
+    (flexmock(RemoteHost)
+     .should_receive('iter_rpms_installed')
+     .replace_with(lambda: iter(package_list.splitlines())))
+    flexmock(RemoteHost).should_receive('close').at_least().once()
 
     task_results = {'binary-container-build-x86-64': {'task_result': json.dumps(X86_64_HOST)},
                     'binary-container-build-s390x': {'task_result': json.dumps(S390X_HOST)}}
@@ -225,7 +228,7 @@ def test_get_build_metadata_fails(task_results, remote_hosts, error_msg,
     workflow.data.plugins_results[PLUGIN_CHECK_AND_SET_PLATFORMS_KEY] = ["x86_64"]
     workflow.data.tag_conf.add_unique_image("ns/img:1.0-1")
 
-    flexmock(RemoteHost).should_receive('rpms_installed').and_return(None)
+    flexmock(RemoteHost).should_receive('iter_rpms_installed').replace_with(lambda: iter([]))
     flexmock(workflow.osbs).should_receive('get_task_results').and_return(task_results)
 
     plugin = GatherBuildsMetadataPlugin(workflow, koji_upload_dir="path/to/upload")
@@ -234,3 +237,28 @@ def test_get_build_metadata_fails(task_results, remote_hosts, error_msg,
                return_value=([], None)):
         with pytest.raises(RuntimeError, match=error_msg):
             plugin.run()
+
+
+@patch("koji.ClientSession", new=MockedClientSession)
+def test_get_build_metadata_partial_rpms(workflow: DockerBuildWorkflow):
+    mock_reactor_config(workflow, remote_hosts=REMOTE_HOST_CONFIG)
+    workflow.data.plugins_results[PLUGIN_CHECK_AND_SET_PLATFORMS_KEY] = ["x86_64"]
+    workflow.data.tag_conf.add_unique_image("ns/img:1.0-1")
+    task_results = {'binary-container-build-x86-64': {'task_result': json.dumps(X86_64_HOST)}}
+
+    def iter_rpms_dropped():
+        yield ('python-docker-py;1.3.1;1.fc24;noarch;(none);191456;'
+               '7c1f60d8cde73e97a45e0c489f4a3b26;1438058212;(none);(none);(none);(none)')
+        raise OSError("connection reset by peer")
+
+    flexmock(RemoteHost).should_receive('iter_rpms_installed').replace_with(iter_rpms_dropped)
+    flexmock(RemoteHost).should_receive('close').once()
+    flexmock(workflow.osbs).should_receive('get_task_results').and_return(task_results)
+
+    plugin = GatherBuildsMetadataPlugin(workflow, koji_upload_dir="path/to/upload")
+
+    with patch("atomic_reactor.plugins.gather_builds_metadata.get_output",
+               return_value=([], None)):
+        error_msg = f"unable to obtain installed rpms on: {X86_64_HOST}"
+        with pytest.raises(RuntimeError, match=error_msg):
+            plugin.run()
@@ -6,14 +6,15 @@ This software may be modified and distributed under the terms
 of the BSD license. See the LICENSE file for details.
 """
 import functools
-import subprocess
 from pathlib import Path
 from tempfile import _RandomNameSequence
 
 import pytest
+import rpm
 from flexmock import flexmock
 
 from atomic_reactor.plugin import PluginFailedException
+from atomic_reactor.plugins import rpmqa
 from atomic_reactor.plugins.rpmqa import RPMqaPlugin, RPMDB_DIR_NAME, RPMDB_PATH
 from atomic_reactor.utils import retries
 from atomic_reactor.utils.rpm import parse_rpm_output
@@ -50,6 +51,12 @@ def mock_oc_image_extract(cmd, empty_dir=False) -> None:
         rpm_dir.joinpath('Packages').touch()
 
 
+def mock_get_rpm_list(separator=';', dbpath=None, ignore_names=()):
+    """Mock `get_rpm_list`, leaving out RPMs the same way the rpmdb query does"""
+    return [line for line in PACKAGE_LIST_WITH_AUTOGENERATED
+            if line.split(separator, 1)[0] not in ignore_names]
+
+
 def mock_logs(cid, **kwargs):
     return b"\n".join(PACKAGE_LIST_WITH_AUTOGENERATED_B)
 
@@ -86,8 +93,9 @@ def setup_mock_logs_retry(cache=None):
     {"ignore": True, "package_list": PACKAGE_LIST},
     {"ignore": False, "package_list": PACKAGE_LIST_WITH_AUTOGENERATED},
 ])
+@pytest.mark.parametrize('parallel', [True, False])
 def test_rpmqa_plugin_success(caplog, workflow, build_dir, base_from_scratch,
-                              ignore_autogenerated):
+                              ignore_autogenerated, parallel):
     (flexmock(retries)
      .should_receive("run_cmd")
      .replace_with(mock_oc_image_extract))
@@ -97,10 +105,10 @@ def test_rpmqa_plugin_success(caplog, workflow, build_dir, base_from_scratch,
      .times(4)
      .and_return('abcdef12'))
 
-    (flexmock(subprocess)
-     .should_receive("check_output")
+    (flexmock(rpmqa)
+     .should_receive("get_rpm_list")
      .times(4)
-     .and_return("\n".join(PACKAGE_LIST_WITH_AUTOGENERATED)))
+     .replace_with(mock_get_rpm_list))
 
     platforms = ['x86_64', 's390x', 'ppc64le', 'aarch64']
     workflow.build_dir.init_build_dirs(platforms, workflow.source)
@@ -110,6 +118,7 @@ def test_rpmqa_plugin_success(caplog, workflow, build_dir, base_from_scratch,
      .for_plugin(RPMqaPlugin.key)
      .set_plugin_args({"ignore_autogenerated_gpg_keys": ignore_autogenerated["ignore"]})
      .set_dockerfile_images(['scratch'] if base_from_scratch else [])
+     .set_reactor_config({'parallel_platform_actions': parallel})
      .create_runner()
      .run())
 
@@ -139,8 +148,8 @@ def test_rpmqa_plugin_rpm_query_failed(caplog, workflow, build_dir, base_from_sc
 
     log_msg_getting = 'getting rpms from rpmdb:'
 
-    (flexmock(subprocess)
-     .should_receive("check_output")
+    (flexmock(rpmqa)
+     .should_receive("get_rpm_list")
      .once()
      .and_raise(Exception, 'rpm query failed'))
 
@@ -151,6 +160,27 @@ def test_rpmqa_plugin_rpm_query_failed(caplog, workflow, build_dir, base_from_sc
     assert log_msg in caplog.text
 
 
+def test_rpmqa_plugin_rpmdb_open_failed(caplog, workflow, build_dir):
+    platforms = ['x86_64']
+    workflow.data.tag_conf.add_unique_image(f'registry.com/{TEST_IMAGE}')
+    workflow.build_dir.init_build_dirs(platforms, workflow.source)
+
+    (flexmock(retries)
+     .should_receive("run_cmd")
+     .replace_with(mock_oc_image_extract))
+
+    ts = flexmock(dbMatch=lambda: [])
+    ts.should_receive('openDB').once().and_return(1)
+    ts.should_receive('closeDB').once()
+    flexmock(rpm).should_receive('TransactionSet').and_return(ts)
+
+    runner = MockEnv(workflow).for_plugin(RPMqaPlugin.key).create_runner()
+
+    with pytest.raises(PluginFailedException, match='rpmdb open failed'):
+        runner.run()
+    assert 'Failed to get rpms from rpmdb:' in caplog.text
+
+
 @pytest.mark.parametrize('base_from_scratch', [
     True,
     False,
@@ -200,6 +230,20 @@ def test_rpmqa_image_components_already_set(workflow, caplog):
     assert msg in caplog.text
 
 
+def test_rpmqa_skip_flatpak_build(workflow, caplog):
+    platforms = ['x86_64', 's390x', 'ppc64le', 'aarch64']
+    workflow.build_dir.init_build_dirs(platforms, workflow.source)
+    workflow.user_params['flatpak'] = True
+
+    flexmock(rpmqa).should_receive('get_rpm_list').never()
+
+    MockEnv(workflow).for_plugin(RPMqaPlugin.key).create_runner().run()
+
+    msg = 'Image components of flatpaks are listed by flatpak_create_oci, skip'
+    assert msg in caplog.text
+    assert not workflow.data.image_components
+
+
 def test_rpmqa_plugin_exception(workflow):
     platforms = ['x86_64', 's390x', 'ppc64le', 'aarch64']
     workflow.build_dir.init_build_dirs(platforms, workflow.source)
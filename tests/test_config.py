@@ -610,7 +610,7 @@ odcs:
         'openshift', 'group_manifests', 'platform_descriptors', 'prefer_schema1_digest',
         'content_versions', 'registry', 'yum_proxy', 'source_registry', 'sources_command',
         'required_secrets', 'hide_files', 'skip_koji_check_for_base_image',
-        'deep_manifest_list_inspection'
+        'deep_manifest_list_inspection', 'parallel_platform_actions'
     ])
     def test_get_methods(self, parse_from, method, tmpdir, caplog, monkeypatch):
         if parse_from == 'raw':
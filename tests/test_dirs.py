@@ -231,6 +231,29 @@ def test_rootbuilddir_for_each_platform_failure_from_action(build_dir, mock_sour
         root.for_each_platform(failure_action)
 
 
+def test_rootbuilddir_for_each_platform_parallel(build_dir, mock_source):
+    root = RootBuildDir(build_dir)
+    root.init_build_dirs(["x86_64", "s390x"], mock_source)
+    results = root.for_each_platform_parallel(handle_platform)
+    expected = {
+        "x86_64": "handled x86_64",
+        "s390x": {"reserved_build_id": 1000},
+    }
+    assert expected == results
+
+
+def test_rootbuilddir_for_each_platform_parallel_failure_from_action(build_dir, mock_source):
+    root = RootBuildDir(build_dir)
+    root.init_build_dirs(["x86_64", "s390x"], mock_source)
+    with pytest.raises(ValueError, match="Error is raised"):
+        root.for_each_platform_parallel(failure_action)
+
+
+def test_rootbuilddir_for_each_platform_parallel_not_inited(build_dir):
+    with pytest.raises(BuildDirIsNotInitialized, match="not initialized yet"):
+        RootBuildDir(build_dir).for_each_platform_parallel(lambda path: None)
+
+
 def create_dockerfile(build_dir: BuildDir) -> Iterable[Path]:
     # Create: ./Dockerfile
     dockerfile = build_dir.path / DOCKERFILE_FILENAME
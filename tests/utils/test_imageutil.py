@@ -367,32 +367,29 @@ class TestImageUtil:
         ):
             image_util.get_uncompressed_image_layer_sizes(path=path)
 
-    def test_extract_filesystem_layer(self, tmpdir):
+    def test_open_filesystem_layer(self, tmpdir):
         image_util = imageutil.ImageUtil(util.DockerfileImages([]), self.config)
         src_path = Path(tmpdir) / 'tarball.tar'
-        dst_path = Path(tmpdir) / 'dst'
-        expected_layer_filename = 'd31505fd5050f6b96ca3268d1db58fc91ae561ddf14eaabc41d63ea2ef8c1c6d.tar' # noqa
+        layer_filename = 'd31505fd5050f6b96ca3268d1db58fc91ae561ddf14eaabc41d63ea2ef8c1c6d.tar'
+        layer_content = b'filesystem layer content'
         manifest_file_content = (
             '[{"Config": "ec3f0931a6e6b6855d76b2d7b0be30e81860baccd891b2e243280bf1cd8ad710.json"'
             ', "RepoTags": [], '
-            '"Layers": ["d31505fd5050f6b96ca3268d1db58fc91ae561ddf14eaabc41d63ea2ef8c1c6d.tar"]}]'
+            f'"Layers": ["{layer_filename}"]}}]'
         ).encode('utf-8')
         mocked_files = {
             'manifest.json': {'content': manifest_file_content, 'size': len(manifest_file_content)},
-            expected_layer_filename: {'content': None, 'size': 1}
+            layer_filename: {'content': layer_content, 'size': len(layer_content)}
         }
 
         mock_tarball(tarball_path=src_path, files=mocked_files)
 
-        actual_layer_filename = image_util.extract_filesystem_layer(src_path, dst_path)
-
-        assert actual_layer_filename == expected_layer_filename
-        assert (dst_path / expected_layer_filename).exists()
+        with image_util.open_filesystem_layer(src_path) as f:
+            assert f.read() == layer_content
 
-    def test_extract_filesystem_layer_more_than_one_layer_fail(self, tmpdir):
+    def test_open_filesystem_layer_more_than_one_layer_fail(self, tmpdir):
         image_util = imageutil.ImageUtil(util.DockerfileImages([]), self.config)
         src_path = Path(tmpdir) / 'tarball.tar'
-        dst_path = Path(tmpdir) / 'dst'
         manifest_file_content = (
             '[{"Config":"62700350851fb36b2e770ba33639e9d111616d39fc63da8845a5e53e9ad013de.json",'
             '"RepoTags":[],'
@@ -428,12 +425,12 @@ class TestImageUtil:
         mock_tarball(tarball_path=src_path, files=mocked_files)
 
         with pytest.raises(ValueError, match=f'Tarball at {src_path} has more than 1 layer'):
-            image_util.extract_filesystem_layer(src_path, dst_path)
+            with image_util.open_filesystem_layer(src_path):
+                pass
 
-    def test_extract_filesystem_layer_multiple_entries_in_manifest_json(self, tmpdir):
+    def test_open_filesystem_layer_multiple_entries_in_manifest_json(self, tmpdir):
         image_util = imageutil.ImageUtil(util.DockerfileImages([]), self.config)
         src_path = Path(tmpdir) / 'tarball.tar'
-        dst_path = Path(tmpdir) / 'dst'
         expected_layer_filename = 'd31505fd5050f6b96ca3268d1db58fc91ae561ddf14eaabc41d63ea2ef8c1c6d.tar' # noqa
         manifest_file_content = (
             '[{"Config": "ec3f0931a6e6b6855d76b2d7b0be30e81860baccd891b2e243280bf1cd8ad710.json"'
@@ -454,4 +451,5 @@ class TestImageUtil:
         with pytest.raises(
                 ValueError, match="manifest.json file has multiple entries, expected only one"
         ):
-            image_util.extract_filesystem_layer(src_path, dst_path)
+            with image_util.open_filesystem_layer(src_path):
+                pass
@@ -7,8 +7,12 @@ of the BSD license. See the LICENSE file for details.
 """
 
 import backoff
+import paramiko
 import pytest
 import re
+import socket
+import threading
+from datetime import datetime
 from flexmock import flexmock, Mock
 from functools import wraps
 from typing import Callable, Optional, Tuple
@@ -27,12 +31,18 @@ def _do_nothing_decorator(func):
 flexmock(backoff).should_receive("on_exception").and_return(_do_nothing_decorator)
 
 
+from atomic_reactor.utils import remote_host  # noqa
 from atomic_reactor.utils.remote_host import (  # noqa
-    SSHRetrySession, RemoteHost, RemoteHostsPool
+    SSHRetrySession, PipelinedShell, RemoteHost, RemoteHostError, RemoteHostsPool, SlotData,
+    SlotReadError
 )
 
 
 SOCKET_PATH = "/run/user/2022/podman/podman.sock"
+MKDIR_SLOTS_CMD = (
+    "mkdir -p /home/builder/osbs_slots && touch /home/builder/osbs_slots/slot_0 "
+    "/home/builder/osbs_slots/slot_1 /home/builder/osbs_slots/slot_2"
+)
 
 
 @pytest.fixture(autouse=True)
@@ -43,25 +53,73 @@ def _mock_ssh_session(request):
     else:
         flexmock(SSHRetrySession).should_receive("connect")
         flexmock(RemoteHost).should_receive("slots_dir").and_return("/home/builder/osbs_slots")
+        mock_pipelined_shell()
         yield
 
 
+def mock_pipelined_shell():
+    """ Run commands of pipelined shells through the mocked exec_command """
+    flexmock(SSHRetrySession).should_receive("open_pipelined_shell").and_return(SSHRetrySession())
+
+
+class FakeChannel:
+    """ Channel of a finished command with all its output received """
+
+    def __init__(self, stdout: str = "", stderr: str = "", code: int = 0):
+        self._stdout = stdout.encode()
+        self._stderr = stderr.encode()
+        self._code = code
+        self.eof_received = True
+        self.closed = False
+
+    def recv_ready(self) -> bool:
+        return bool(self._stdout)
+
+    def recv(self, nbytes: int) -> bytes:
+        data, self._stdout = self._stdout[:nbytes], self._stdout[nbytes:]
+        return data
+
+    def recv_stderr_ready(self) -> bool:
+        return bool(self._stderr)
+
+    def recv_stderr(self, nbytes: int) -> bytes:
+        data, self._stderr = self._stderr[:nbytes], self._stderr[nbytes:]
+        return data
+
+    def recv_exit_status(self) -> int:
+        return self._code
+
+    def close(self):
+        self.closed = True
+
+
 def make_ssh_result(
     stdout: str = "",
     stderr: str = "",
     code: int = 0
 ) -> Tuple[None, Mock, Mock]:
     """ Produce a fake non-blocking ssh exec_command result """
+    chan = FakeChannel(stdout, stderr, code)
+    return None, flexmock(channel=chan), flexmock(channel=chan)
 
-    chan = flexmock()
-    chan.should_receive("recv_exit_status").and_return(code)
 
-    out = flexmock(channel=chan)
-    out.should_receive("read.decode.strip").and_return(stdout)
+def make_read_all_slots_cmd(slots_dir: str, slots: int) -> str:
+    """ Produce the command reading content of all slots on host """
+    slot_ids = " ".join(str(slot_id) for slot_id in range(slots))
+    return (
+        f"cd {slots_dir} && for i in {slot_ids}; do "
+        f"touch slot_$i && printf '%s\\037' $i && cat slot_$i && printf '\\036' "
+        f"|| exit 1; done"
+    )
 
-    err = flexmock()
-    err.should_receive("read.decode.strip").and_return(stderr)
-    return None, out, err
+
+def make_read_all_slots_result(*slots_content: str) -> Tuple[None, Mock, Mock]:
+    """ Produce a fake result of the command reading content of all slots """
+    stdout = "".join(
+        f"{slot_id}\x1f{content}\n\x1e" if content else f"{slot_id}\x1f\x1e"
+        for slot_id, content in enumerate(slots_content)
+    )
+    return make_ssh_result(stdout=stdout.strip())
 
 
 def make_flock_ssh_result(
@@ -100,7 +158,7 @@ def test_host_is_operational(mkdir_stderr, mkdir_code, expected_result, caplog):
                       ssh_keyfile="/path/to/key", slots=3, socket_path=SOCKET_PATH)
 
     def mocked_command(cmd, *args, **kwargs):
-        if cmd == "mkdir -p /home/builder/osbs_slots":
+        if cmd == MKDIR_SLOTS_CMD:
             return make_ssh_result(stderr=mkdir_stderr, code=mkdir_code)
 
         assert False, f"Unexpected command: {cmd}"
@@ -118,6 +176,32 @@ def test_host_is_operational(mkdir_stderr, mkdir_code, expected_result, caplog):
         assert mkdir_stderr in caplog.text
 
 
+def test_host_is_operational_is_cached():
+    host = RemoteHost(hostname="remote-host-001", username="builder",
+                      ssh_keyfile="/path/to/key", slots=3, socket_path=SOCKET_PATH)
+
+    (
+        flexmock(SSHRetrySession)
+        .should_receive("exec_command")
+        .with_args(MKDIR_SLOTS_CMD, timeout=int)
+        .and_return(make_ssh_result())
+        .twice()
+    )
+    (
+        flexmock(SSHRetrySession)
+        .should_receive("exec_command")
+        .with_args("false", timeout=int)
+        .and_raise(paramiko.ssh_exception.SSHException("connection lost"))
+    )
+
+    assert host.is_operational
+    # checked again only after a failure
+    assert host.is_operational
+    with pytest.raises(paramiko.ssh_exception.SSHException):
+        host._run("false")
+    assert host.is_operational
+
+
 @pytest.mark.parametrize(("rpm_stderr", "rpm_code", "expected_result"), (
     ("", 0, 'list;of;rpms'),
     ("rpm: no rpm db found", 1, None),
@@ -160,7 +244,8 @@ def test_using_non_default_slots_dir():
     flexmock(SSHRetrySession).should_receive("connect")
 
     def mocked_command(cmd, *args, **kwargs):
-        if cmd == f"mkdir -p {slots_dir}":
+        if cmd == (f"mkdir -p {slots_dir} && touch {slots_dir}slot_0 "
+                   f"{slots_dir}slot_1 {slots_dir}slot_2"):
             return make_ssh_result()
 
         assert False, f"Unexpected command: {cmd}"
@@ -193,7 +278,7 @@ def test_check_slot_is_free(cat_stdout, cat_stderr, cat_code, expected_result):
                       ssh_keyfile="/path/to/key", slots=3, socket_path=SOCKET_PATH)
 
     def mocked_command(cmd, *args, **kwargs):
-        if cmd == "touch /home/builder/osbs_slots/slot_2 && cat /home/builder/osbs_slots/slot_2":
+        if cmd == "cat /home/builder/osbs_slots/slot_2":
             return make_ssh_result(cat_stdout, cat_stderr, cat_code)
 
         assert False, f"Unexpected command: {cmd}"
@@ -208,19 +293,46 @@ def test_check_slot_is_free(cat_stdout, cat_stderr, cat_code, expected_result):
     assert free is expected_result
 
 
+def test_check_slot_is_free_with_missing_slot_file():
+    host = RemoteHost(hostname="remote-host-001", username="builder",
+                      ssh_keyfile="/path/to/key", slots=3, socket_path=SOCKET_PATH)
+
+    cat_error = "cat: /home/builder/osbs_slots/slot_2: No such file or directory"
+    (
+        flexmock(SSHRetrySession)
+        .should_receive("exec_command")
+        .with_args("cat /home/builder/osbs_slots/slot_2", timeout=int)
+        .and_return(make_ssh_result(stderr=cat_error, code=1))
+        .once()
+    )
+    (
+        flexmock(SSHRetrySession)
+        .should_receive("exec_command")
+        .with_args("touch /home/builder/osbs_slots/slot_2 && cat /home/builder/osbs_slots/slot_2",
+                   timeout=int)
+        .and_return(make_ssh_result())
+        .once()
+    )
+    with host._ssh_session() as session:
+        assert host.is_free(2, session)
+
+
 def test_lock_a_free_slot(caplog):
     host = RemoteHost(hostname="remote-host-001", username="builder",
                       ssh_keyfile="/path/to/key", slots=3, socket_path=SOCKET_PATH)
 
     def mocked_command(cmd, *args, **kwargs):
-        if cmd == "touch /home/builder/osbs_slots/slot_2 && cat /home/builder/osbs_slots/slot_2":
+        if cmd == "cat /home/builder/osbs_slots/slot_2":
             return make_ssh_result()
 
-        if cmd == ("flock --conflict-exit-code 42 --nonblocking "
+        if cmd == ("flock --conflict-exit-code 42 --timeout 30 "
                    "/home/builder/osbs_slots/slot_2.lock cat"):
             return make_flock_ssh_result(stdout="verify lock")
 
-        write_patt = re.compile(r"echo pr123@.*> /home/builder/osbs_slots/slot_2")
+        write_patt = re.compile(
+            r"printf '%s\\n' pr123@\d{4}-\d\d-\d\dT\d\d:\d\d:\d\d\.\d{6}\+00:00 "
+            r"> /home/builder/osbs_slots/slot_2"
+        )
         if write_patt.match(cmd):
             return make_ssh_result()
 
@@ -241,10 +353,10 @@ def test_lock_an_occupied_slot(caplog):
                       ssh_keyfile="/path/to/key", slots=3, socket_path=SOCKET_PATH)
 
     def mocked_command(cmd, *args, **kwargs):
-        if cmd == "touch /home/builder/osbs_slots/slot_2 && cat /home/builder/osbs_slots/slot_2":
+        if cmd == "cat /home/builder/osbs_slots/slot_2":
             return make_ssh_result(stdout="123@2022-02-15T10:12:13.780426")
 
-        if cmd == ("flock --conflict-exit-code 42 --nonblocking "
+        if cmd == ("flock --conflict-exit-code 42 --timeout 30 "
                    "/home/builder/osbs_slots/slot_2.lock cat"):
             return make_flock_ssh_result(stdout="")
 
@@ -265,10 +377,10 @@ def test_lock_slot_with_other_locking_on_it(caplog):
                       ssh_keyfile="/path/to/key", slots=3, socket_path=SOCKET_PATH)
 
     def mocked_command(cmd, *args, **kwargs):
-        if cmd == "touch /home/builder/osbs_slots/slot_2 && cat /home/builder/osbs_slots/slot_2":
+        if cmd == "cat /home/builder/osbs_slots/slot_2":
             return make_ssh_result()
 
-        if cmd == ("flock --conflict-exit-code 42 --nonblocking "
+        if cmd == ("flock --conflict-exit-code 42 --timeout 30 "
                    "/home/builder/osbs_slots/slot_2.lock cat"):
             return make_flock_ssh_result(code=42)
 
@@ -289,10 +401,10 @@ def test_lock_slot_with_flock_cat_error(caplog):
                       ssh_keyfile="/path/to/key", slots=3, socket_path=SOCKET_PATH)
 
     def mocked_command(cmd, *args, **kwargs):
-        if cmd == "touch /home/builder/osbs_slots/slot_2 && cat /home/builder/osbs_slots/slot_2":
+        if cmd == "cat /home/builder/osbs_slots/slot_2":
             return make_ssh_result()
 
-        if cmd == ("flock --conflict-exit-code 42 --nonblocking "
+        if cmd == ("flock --conflict-exit-code 42 --timeout 30 "
                    "/home/builder/osbs_slots/slot_2.lock cat"):
             return make_flock_ssh_result(
                 code=66,
@@ -314,26 +426,24 @@ def test_lock_slot_with_flock_cat_error(caplog):
 def test_lock_an_invalid_slot(caplog):
     host = RemoteHost(hostname="remote-host-001", username="builder",
                       ssh_keyfile="/path/to/key", slots=3, socket_path=SOCKET_PATH)
-    # Need to return different content for the same read slot commands,
-    # which is not easy in a single mocked_command, so set it one by one
-    read_slot = "touch /home/builder/osbs_slots/slot_2 && cat /home/builder/osbs_slots/slot_2"
+    # The slot is read only once per lock attempt
+    read_slot = "cat /home/builder/osbs_slots/slot_2"
     cmd_kwargs = {"timeout": int}
     (
         flexmock(SSHRetrySession)
         .should_receive("exec_command")
         .with_args(read_slot, **cmd_kwargs)
-        .and_return(make_ssh_result())  # return empty slot for the first call
-        .and_return(make_ssh_result(stdout="invalid_slot_content"))  # return invalid content
-        .and_return(make_ssh_result(stdout="pr123@2022-09-22T13:11:23.512100"))
+        .and_return(make_ssh_result(stdout="invalid_slot_content"))
+        .once()
     )
-    write_patt = re.compile(r"echo pr123@.*> /home/builder/osbs_slots/slot_2")
+    write_patt = re.compile(r"printf '%s\\n' pr123@.*> /home/builder/osbs_slots/slot_2")
     (
         flexmock(SSHRetrySession)
         .should_receive("exec_command")
         .with_args(write_patt, **cmd_kwargs)
         .and_return(make_ssh_result())
     )
-    flock = "flock --conflict-exit-code 42 --nonblocking /home/builder/osbs_slots/slot_2.lock cat"
+    flock = "flock --conflict-exit-code 42 --timeout 30 /home/builder/osbs_slots/slot_2.lock cat"
     (
         flexmock(SSHRetrySession)
         .should_receive("exec_command")
@@ -343,6 +453,7 @@ def test_lock_an_invalid_slot(caplog):
 
     locked = host.lock(2, "pr123")
     assert locked
+    assert "slot 2 contains invalid content, it's corrupted, will use it" in caplog.text
     assert "remote-host-001: slot 2 is locked for pipelinerun pr123" in caplog.text
 
 
@@ -357,14 +468,14 @@ def test_unlock_host_slot(slot_content, expected_log, expected_result, caplog):
                       ssh_keyfile="/path/to/key", slots=3, socket_path=SOCKET_PATH)
 
     def mocked_command(cmd, *args, **kwargs):
-        if cmd == "touch /home/builder/osbs_slots/slot_2 && cat /home/builder/osbs_slots/slot_2":
+        if cmd == "cat /home/builder/osbs_slots/slot_2":
             return make_ssh_result(stdout=slot_content)
 
-        if cmd == ("flock --conflict-exit-code 42 --nonblocking "
+        if cmd == ("flock --conflict-exit-code 42 --timeout 30 "
                    "/home/builder/osbs_slots/slot_2.lock cat"):
             return make_flock_ssh_result(stdout="verify lock")
 
-        write_patt = re.compile(r"truncate -s 0 /home/builder/osbs_slots/slot_2")
+        write_patt = re.compile(r": > /home/builder/osbs_slots/slot_2")
         if write_patt.match(cmd):
             return make_ssh_result()
 
@@ -415,28 +526,33 @@ def test_pool_lock_resource(slot_content, expected_log, expected_result, failure
          .and_raise(Exception))
 
     def mocked_command(cmd, *args, **kwargs):
-        if cmd == "mkdir -p /var/tmp/osbs_slots":
+        if cmd == ("mkdir -p /var/tmp/osbs_slots && touch /var/tmp/osbs_slots/slot_0 "
+                   "/var/tmp/osbs_slots/slot_1 /var/tmp/osbs_slots/slot_2"):
             return make_ssh_result()
 
+        if cmd == make_read_all_slots_cmd("/var/tmp/osbs_slots", 3):
+            return make_read_all_slots_result(*[slot_content] * 3)
+
         read_patt = re.compile(
-            r"touch /var/tmp/osbs_slots/slot_.* && cat /var/tmp/osbs_slots/slot_.*"
+            r"cat /var/tmp/osbs_slots/slot_.*"
         )
         if read_patt.match(cmd):
             return make_ssh_result(stdout=slot_content)
 
         flock_patt = re.compile(
-            r"flock --conflict-exit-code 42 --nonblocking /var/tmp/osbs_slots/slot_.*.lock cat"
+            r"flock --conflict-exit-code 42 --timeout 30 /var/tmp/osbs_slots/slot_.*.lock cat"
         )
         if flock_patt.match(cmd):
             return make_flock_ssh_result(stdout="verify lock")
 
-        write_patt = re.compile(r"echo pr123@.*> /var/tmp/osbs_slots/slot_.*")
+        write_patt = re.compile(r"printf '%s\\n' pr123@.*> /var/tmp/osbs_slots/slot_.*")
         if write_patt.match(cmd):
             return make_ssh_result()
 
         assert False, f"Unexpected command: {cmd}"
 
     flexmock(SSHRetrySession).should_receive("connect")
+    mock_pipelined_shell()
 
     (
         flexmock(SSHRetrySession)
@@ -468,14 +584,8 @@ def test_available_and_occupied_slots(caplog, slot0, slot1, slot2, available, oc
                       ssh_keyfile="/path/to/key", slots=3, socket_path=SOCKET_PATH)
 
     def mocked_command(cmd, *args, **kwargs):
-        if cmd == "touch /home/builder/osbs_slots/slot_0 && cat /home/builder/osbs_slots/slot_0":
-            return make_ssh_result(stdout=slot0)
-
-        if cmd == "touch /home/builder/osbs_slots/slot_1 && cat /home/builder/osbs_slots/slot_1":
-            return make_ssh_result(stdout=slot1)
-
-        if cmd == "touch /home/builder/osbs_slots/slot_2 && cat /home/builder/osbs_slots/slot_2":
-            return make_ssh_result(stdout=slot2)
+        if cmd == make_read_all_slots_cmd("/home/builder/osbs_slots", 3):
+            return make_read_all_slots_result(slot0, slot1, slot2)
 
         assert False, f"Unexpected command: {cmd}"
 
@@ -502,13 +612,13 @@ def test_prid_in_slot(caplog, slot0, slot1, slot2, prid0, prid1, prid2):
                       ssh_keyfile="/path/to/key", slots=3, socket_path=SOCKET_PATH)
 
     def mocked_command(cmd, *args, **kwargs):
-        if cmd == "touch /home/builder/osbs_slots/slot_0 && cat /home/builder/osbs_slots/slot_0":
+        if cmd == "cat /home/builder/osbs_slots/slot_0":
             return make_ssh_result(stdout=slot0)
 
-        if cmd == "touch /home/builder/osbs_slots/slot_1 && cat /home/builder/osbs_slots/slot_1":
+        if cmd == "cat /home/builder/osbs_slots/slot_1":
             return make_ssh_result(stdout=slot1)
 
-        if cmd == "touch /home/builder/osbs_slots/slot_2 && cat /home/builder/osbs_slots/slot_2":
+        if cmd == "cat /home/builder/osbs_slots/slot_2":
             return make_ssh_result(stdout=slot2)
 
         assert False, f"Unexpected command: {cmd}"
@@ -522,3 +632,375 @@ def test_prid_in_slot(caplog, slot0, slot1, slot2, prid0, prid1, prid2):
     assert host.prid_in_slot(0) == prid0
     assert host.prid_in_slot(1) == prid1
     assert host.prid_in_slot(2) == prid2
+
+
+@pytest.mark.disable_autouse
+def test_pool_lock_resource_probes_all_hosts(caplog):
+    hosts_config = {
+        "slots_dir": "/var/tmp/osbs_slots",
+        "pools": {
+            "x86_64": {
+                f"remote-host-00{i}": {
+                    "enabled": True,
+                    "auth": "/path/to/key",
+                    "username": "builder",
+                    "slots": 3,
+                    "socket_path": SOCKET_PATH,
+                }
+                for i in range(1, 4)
+            }
+        }
+    }
+    flexmock(RemoteHost).should_receive("is_operational").and_return(True)
+    flexmock(RemoteHost).should_receive("lock").and_return(True)
+
+    pool = RemoteHostsPool.from_config(hosts_config, platform="x86_64")
+    pool_hosts = list(pool.hosts)
+    hosts = {host.hostname: host for host in pool.hosts}
+    flexmock(hosts["remote-host-001"]).should_receive("available_slots").and_return([0])
+    flexmock(hosts["remote-host-002"]).should_receive("available_slots").and_return([0, 1])
+    (flexmock(hosts["remote-host-003"])
+     .should_receive("available_slots")
+     .and_raise(Exception("connection refused")))
+
+    locked = pool.lock_resource("pr123")
+
+    # the host with the highest ratio of free slots is preferred
+    assert locked.host.hostname == "remote-host-002"
+    assert "remote-host-001: available slots: [0]" in caplog.text
+    # the order of hosts in the pool is kept
+    assert pool.hosts == pool_hosts
+    assert "remote-host-003: unable to get available slots: connection refused" in caplog.text
+
+
+@pytest.mark.parametrize(("stdout", "stderr", "code"), (
+    ("", "cd: /home/builder/osbs_slots: No such file or directory", 1),
+    ("0\x1f\x1e1\x1f", "", 0),
+))
+def test_available_slots_read_error(stdout, stderr, code):
+    host = RemoteHost(hostname="remote-host-001", username="builder",
+                      ssh_keyfile="/path/to/key", slots=3, socket_path=SOCKET_PATH)
+
+    (
+        flexmock(SSHRetrySession)
+        .should_receive("exec_command")
+        .with_args(make_read_all_slots_cmd("/home/builder/osbs_slots", 3), timeout=int)
+        .and_return(make_ssh_result(stdout, stderr, code))
+    )
+
+    with pytest.raises(SlotReadError, match="remote-host-001: cannot read content of slots"):
+        host.available_slots()
+
+
+@pytest.mark.parametrize("active", [True, False])
+def test_ssh_connection_is_reused(active):
+    host = RemoteHost(hostname="remote-host-001", username="builder",
+                      ssh_keyfile="/path/to/key", slots=3, socket_path=SOCKET_PATH)
+
+    transport = flexmock(is_active=lambda: active)
+    client = flexmock(get_transport=lambda: transport)
+    client.should_receive("run").and_return(("", "", 0)).twice()
+    client.should_receive("close").times(1 if active else 2)
+    (
+        flexmock(host)
+        .should_receive("_open_ssh_session")
+        .and_return(client)
+        .times(1 if active else 2)
+    )
+
+    host._run("true")
+    host._run("true")
+    host.close()
+    # closing twice is harmless
+    host.close()
+
+
+def test_pipelined_shell():
+    written = []
+    stdin = flexmock(flush=lambda: None)
+    stdin.should_receive("write").replace_with(written.append)
+    stdin.should_receive("close").once()
+    chan = flexmock()
+    chan.should_receive("close").once()
+    stdout = flexmock(channel=chan)
+    stderr = flexmock()
+    session = SSHRetrySession()
+    (
+        flexmock(session)
+        .should_receive("exec_command")
+        .with_args("sh", timeout=int)
+        .and_return((stdin, stdout, stderr))
+        .once()
+    )
+
+    shell = PipelinedShell(session)
+    sentinel = shell._sentinel
+    stdout.should_receive("readline").replace_with(iter([
+        "pr123@2022-02-15T10:22:33.234234\n", "\n", f"{sentinel} 0\n",
+        "\n", f"{sentinel} 1\n",
+        "",
+    ]).__next__)
+    stderr.should_receive("readline").replace_with(iter([
+        "some warning\n", "\n", f"{sentinel}\n",
+        "cat: slot_3: No such file or directory\n", "\n", f"{sentinel}\n",
+    ]).__next__)
+
+    assert shell.run("cat slot_2") == ("pr123@2022-02-15T10:22:33.234234", "some warning", 0)
+    assert shell.run("cat slot_3") == ("", "cat: slot_3: No such file or directory", 1)
+    with pytest.raises(RemoteHostError, match="shell exited"):
+        shell.run("exit")
+    shell.close()
+
+    assert written[0] == (
+        f"{{ cat slot_2\n}}; rc=$?; printf '\\n{sentinel}\\n' >&2; "
+        f"printf '\\n{sentinel} %d\\n' $rc\n"
+    )
+
+
+def test_slot_data_timestamp_is_parsed_once():
+    data = SlotData.from_string("pr123@2022-02-15T10:22:33.234234")
+    assert data.is_valid
+    parsed = data._parsed_datetime
+    assert parsed == datetime(2022, 2, 15, 10, 22, 33, 234234)
+    # the cached value is reused
+    assert data.is_valid
+    assert data.datetime is parsed
+
+
+def test_slot_data_invalid_timestamp():
+    data = SlotData.from_string("pr123@yesterday")
+    assert not data.is_valid
+    with pytest.raises(ValueError):
+        data.datetime
+
+
+def test_ssh_session_run_reads_stdout_and_stderr_as_they_arrive():
+    chan = FakeChannel()
+    chan.eof_received = False
+    # stderr arrives first, then stdout, then the command finishes
+    received = iter([(b"", b"warning"), (b"x" * 70000, b""), None])
+
+    def wait_for_data(rlist, wlist, xlist, timeout):
+        data = next(received)
+        if data is None:
+            chan.eof_received = True
+        else:
+            chan._stdout, chan._stderr = data
+        return rlist, [], []
+
+    flexmock(remote_host.select).should_receive("select").replace_with(wait_for_data)
+    session = SSHRetrySession()
+    (
+        flexmock(session)
+        .should_receive("exec_command")
+        .and_return((None, flexmock(channel=chan), None))
+    )
+
+    assert session.run("cmd") == ("x" * 70000, "warning", 0)
+
+
+class LateDataChannel(FakeChannel):
+    """ Channel receiving the last data together with EOF right after the buffers were checked """
+
+    def __init__(self, stdout: str):
+        super().__init__()
+        self.eof_received = False
+        self._late_stdout = stdout.encode()
+
+    def recv_stderr_ready(self) -> bool:
+        if self._late_stdout:
+            self._stdout, self._late_stdout = self._late_stdout, b""
+            self.eof_received = True
+        return super().recv_stderr_ready()
+
+
+def test_ssh_session_run_drains_output_received_with_eof():
+    chan = LateDataChannel("last line")
+    flexmock(remote_host.select).should_receive("select").replace_with(
+        lambda rlist, wlist, xlist, timeout: (rlist, [], [])
+    )
+    session = SSHRetrySession()
+    (
+        flexmock(session)
+        .should_receive("exec_command")
+        .and_return((None, flexmock(channel=chan), None))
+    )
+
+    assert session.run("cmd") == ("last line", "", 0)
+
+
+def test_ssh_session_run_timeout():
+    chan = FakeChannel()
+    chan.eof_received = False
+    flexmock(remote_host.select).should_receive("select").and_return(([], [], []))
+    session = SSHRetrySession()
+    (
+        flexmock(session)
+        .should_receive("exec_command")
+        .and_return((None, flexmock(channel=chan), None))
+    )
+
+    with pytest.raises(socket.timeout):
+        session.run("cmd")
+
+
+@pytest.mark.disable_autouse
+def test_pool_lock_resource_does_not_wait_for_other_hosts_when_one_is_free():
+    hosts = [
+        RemoteHost(hostname=f"remote-host-00{i}", username="builder",
+                   ssh_keyfile="/path/to/key", slots=2, socket_path=SOCKET_PATH)
+        for i in range(1, 3)
+    ]
+    free_host, slow_host = hosts
+    slot_locked = threading.Event()
+    probes_finished = []
+
+    def slow_probe():
+        # the free host gets locked while this host is still being probed
+        probes_finished.append(slot_locked.wait(5))
+        return [0]
+
+    def lock(*args):
+        slot_locked.set()
+        return True
+
+    flexmock(RemoteHost).should_receive("is_operational").and_return(True)
+    flexmock(free_host).should_receive("available_slots").and_return([0, 1])
+    flexmock(slow_host).should_receive("available_slots").replace_with(slow_probe)
+    flexmock(free_host).should_receive("lock").replace_with(lock).once()
+    flexmock(slow_host).should_receive("lock").never()
+
+    locked = RemoteHostsPool(hosts, "x86_64").lock_resource("pr123")
+    # the outstanding probe is finished before the pool can be closed
+    assert probes_finished == [True]
+    assert locked.host is free_host
+
+
+@pytest.mark.disable_autouse
+def test_slot_paths():
+    host = RemoteHost(hostname="remote-host-001", username="builder",
+                      ssh_keyfile="/path/to/key", slots=2, socket_path=SOCKET_PATH,
+                      slots_dir="/var/tmp/osbs slots")
+
+    assert host.slot_paths == ("/var/tmp/osbs slots/slot_0", "/var/tmp/osbs slots/slot_1")
+    assert host.quoted_slot_paths == ("'/var/tmp/osbs slots/slot_0'",
+                                      "'/var/tmp/osbs slots/slot_1'")
+    assert host.quoted_slot_lock_paths == ("'/var/tmp/osbs slots/slot_0.lock'",
+                                           "'/var/tmp/osbs slots/slot_1.lock'")
+    assert host._get_slot_lock_path(1) == "/var/tmp/osbs slots/slot_1.lock"
+
+
+def test_run_retries_over_new_connection():
+    host = RemoteHost(hostname="remote-host-001", username="builder",
+                      ssh_keyfile="/path/to/key", slots=3, socket_path=SOCKET_PATH)
+
+    results = iter([paramiko.ssh_exception.SSHException("connection lost"),
+                    make_ssh_result(stdout="ok")])
+
+    def mocked_command(cmd, *args, **kwargs):
+        result = next(results)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    (
+        flexmock(SSHRetrySession)
+        .should_receive("exec_command")
+        .replace_with(mocked_command)
+        .twice()
+    )
+    flexmock(host).should_call("close").once()
+
+    assert host._run("true") == ("ok", "", 0)
+
+
+@pytest.mark.parametrize("chunk_size", [3, 65536])
+def test_ssh_session_iter_lines(chunk_size):
+    chan = FakeChannel("line 1\nline 2\n\nłine 4", "warning")
+    flexmock(remote_host, RECV_BUFFER_SIZE=chunk_size)
+    session = SSHRetrySession()
+    (
+        flexmock(session)
+        .should_receive("exec_command")
+        .and_return((None, flexmock(channel=chan), None))
+    )
+
+    assert list(session.iter_lines("cmd")) == ["line 1", "line 2", "", "łine 4"]
+    assert chan.closed
+
+
+def test_ssh_session_iter_lines_failure():
+    chan = FakeChannel("partial\n", "rpm: no rpm db found", 1)
+    session = SSHRetrySession()
+    (
+        flexmock(session)
+        .should_receive("exec_command")
+        .and_return((None, flexmock(channel=chan), None))
+    )
+
+    lines = session.iter_lines("cmd")
+    assert next(lines) == "partial"
+    with pytest.raises(RemoteHostError, match="exited with code 1: rpm: no rpm db found"):
+        next(lines)
+    assert chan.closed
+
+
+def test_iter_rpms_installed():
+    host = RemoteHost(hostname="remote-host-001", username="builder",
+                      ssh_keyfile="/path/to/key", slots=3, socket_path=SOCKET_PATH)
+
+    (
+        flexmock(SSHRetrySession)
+        .should_receive("exec_command")
+        .with_args(f"rpm {rpm_qf_args()}", timeout=int)
+        .and_return(make_ssh_result(stdout="rpm1;1.0\nrpm2;2.0\n"))
+    )
+
+    assert list(host.iter_rpms_installed()) == ["rpm1;1.0", "rpm2;2.0"]
+
+
+def test_iter_rpms_installed_failure():
+    host = RemoteHost(hostname="remote-host-001", username="builder",
+                      ssh_keyfile="/path/to/key", slots=3, socket_path=SOCKET_PATH)
+
+    (
+        flexmock(SSHRetrySession)
+        .should_receive("exec_command")
+        .and_return(make_ssh_result(stderr="no rpm db", code=1))
+    )
+
+    with pytest.raises(RemoteHostError, match="no rpm db"):
+        list(host.iter_rpms_installed())
+
+
+class DroppedChannel(FakeChannel):
+    """ Channel of a command whose connection drops after the first chunk of stdout """
+
+    def __init__(self, stdout: str):
+        super().__init__(stdout)
+        self.eof_received = False
+        self.recv_called = False
+
+    def recv(self, nbytes: int) -> bytes:
+        if self.recv_called:
+            raise socket.error("connection reset by peer")
+        self.recv_called = True
+        return super().recv(nbytes)
+
+
+def test_iter_rpms_installed_connection_dropped():
+    host = RemoteHost(hostname="remote-host-001", username="builder",
+                      ssh_keyfile="/path/to/key", slots=3, socket_path=SOCKET_PATH)
+
+    chan = DroppedChannel("rpm1;1.0\nrpm2;2.0\n")
+    flexmock(remote_host, RECV_BUFFER_SIZE=len("rpm1;1.0\n"))
+    (
+        flexmock(SSHRetrySession)
+        .should_receive("exec_command")
+        .and_return((None, flexmock(channel=chan), None))
+    )
+
+    rpms = host.iter_rpms_installed()
+    assert next(rpms) == "rpm1;1.0"
+    with pytest.raises(socket.error, match="connection reset by peer"):
+        next(rpms)
@@ -187,3 +187,36 @@ def test_run_cmd_failure(cleanup_cmd, caplog):
         wait = SUBPROCESS_BACKOFF_FACTOR * 2 ** n
         assert f'Backing off run_cmd(...) for {wait:.1f}s' in caplog.text
     assert f'Giving up run_cmd(...) after {total_tries} tries' in caplog.text
+
+
+@pytest.mark.parametrize('cleanup_error', [None, OSError('permission denied')])
+def test_run_cmd_failure_cleanup_func(cleanup_error, caplog):
+    cmd = ["skopeo", "copy", "docker://a", "docker://b"]
+    total_tries = SUBPROCESS_MAX_RETRIES + 1
+    cleanup_calls = 0
+
+    def cleanup_func():
+        nonlocal cleanup_calls
+        cleanup_calls += 1
+        if cleanup_error:
+            raise cleanup_error
+
+    (
+        flexmock(subprocess)
+        .should_receive('run')
+        .with_args(cmd, check=True, capture_output=True)
+        .times(total_tries)
+        .and_raise(subprocess.CalledProcessError(
+            1, cmd, output=b'', stderr=b'something went wrong')
+        )
+    )
+    flexmock(time).should_receive('sleep').times(SUBPROCESS_MAX_RETRIES)
+
+    with pytest.raises(subprocess.CalledProcessError):
+        retries.run_cmd(cmd, cleanup_func=cleanup_func)
+
+    assert cleanup_calls == total_tries
+    if cleanup_error:
+        assert caplog.text.count(
+            'Cleanup after skopeo failed: permission denied'
+        ) == total_tries
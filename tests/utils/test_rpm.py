@@ -7,8 +7,10 @@ of the BSD license. See the LICENSE file for details.
 """
 
 import pytest
+import rpm
+from flexmock import flexmock
 
-from atomic_reactor.utils.rpm import rpm_qf_args, parse_rpm_output
+from atomic_reactor.utils.rpm import get_rpm_list, rpm_qf_args, parse_rpm_output
 
 FAKE_SIGMD5 = b'0' * 32
 FAKE_SIGNATURE = "RSA/SHA256, Tue 30 Aug 2016 00:00:00, Key ID 01234567890abc"
@@ -117,3 +119,62 @@ def test_parse_rpm_output():
             'signature': None,
         }
     ]
+
+
+def mock_transaction_set(open_db_rc=0, headers=()):
+    ts = flexmock()
+    ts.should_receive('openDB').once().and_return(open_db_rc)
+    ts.should_receive('dbMatch').and_return(list(headers))
+    ts.should_receive('closeDB').once()
+    flexmock(rpm).should_receive('TransactionSet').and_return(ts)
+    (flexmock(rpm)
+     .should_receive('addMacro')
+     .with_args('_dbpath', '/some/rpmdb')
+     .once()
+     .ordered())
+    (flexmock(rpm)
+     .should_receive('delMacro')
+     .with_args('_dbpath')
+     .once()
+     .ordered())
+
+
+def test_get_rpm_list_from_dbpath():
+    header = flexmock()
+    header.should_receive('sprintf').with_args('%{NAME}|%{VERSION}').and_return('name1|1.0')
+    mock_transaction_set(headers=[header])
+
+    rpms = get_rpm_list(tags=['NAME', 'VERSION'], separator='|', dbpath='/some/rpmdb')
+    assert rpms == ['name1|1.0']
+
+
+def test_get_rpm_list_from_dbpath_open_failed():
+    mock_transaction_set(open_db_rc=1)
+
+    with pytest.raises(rpm.error, match='rpmdb open failed: /some/rpmdb'):
+        get_rpm_list(dbpath='/some/rpmdb')
+
+
+class MockHeader(object):
+    """Mock rpm header of the given name and query output"""
+    def __init__(self, name, output):
+        self.name = name
+        self.output = output
+
+    def __getitem__(self, tag):
+        assert tag == 'name'
+        return self.name
+
+    def sprintf(self, fmt):
+        return self.output
+
+
+def test_get_rpm_list_ignore_names():
+    headers = [MockHeader('name1', 'name1|1.0'),
+               MockHeader('gpg-pubkey', 'gpg-pubkey|qwe123'),
+               MockHeader('gpg-pubkey-doc', 'gpg-pubkey-doc|1.0')]
+    mock_transaction_set(headers=headers)
+
+    rpms = get_rpm_list(tags=['NAME', 'VERSION'], separator='|', dbpath='/some/rpmdb',
+                        ignore_names=('gpg-pubkey',))
+    assert rpms == ['name1|1.0', 'gpg-pubkey-doc|1.0']